@@ -4,20 +4,44 @@ Flask API Server for Khmer Products Database
 Serves product and manufacturer data from SQLite database
 """
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, g, request, send_file
 from flask_cors import CORS
+from contextlib import contextmanager
+import functools
+import hashlib
+import hmac
+import io
 import sqlite3
 import json
+import msgspec
+import orjson
 import os
-from datetime import datetime
-from werkzeug.utils import secure_filename
+import pathlib
+import queue
+import re
+import secrets
+import threading
+import time
+import zlib
+from werkzeug.middleware.shared_data import SharedDataMiddleware
+from werkzeug.wsgi import get_path_info
+from asgiref.wsgi import WsgiToAsgi
+
+try:
+    import redis
+except ImportError:  # Response caching is optional
+    redis = None
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Database configuration
 # Use absolute path for local development
-DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'khmer_products.db')
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+DATABASE_PATH = os.path.join(APP_ROOT, 'khmer_products.db')
+# Resolved once; pooled connections open the file through this URI.
+# mode=rw never creates the file, so a missing database is not replaced by an empty one.
+DATABASE_URI = pathlib.Path(DATABASE_PATH).as_uri() + '?mode=rw'
 
 # File upload configuration
 UPLOAD_FOLDER = '.'
@@ -25,68 +49,505 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Admin credentials; the password is kept only as a scrypt hash
+ADMIN_USERNAME = 'cbsdigitaladmin'
+ADMIN_PASSWORD_SALT = bytes.fromhex('68b37c1355ff930851a5f1e19ee713ab')
+ADMIN_PASSWORD_HASH = bytes.fromhex('2c9b6c997c47d044af51d632156b1deca77aca3bec17a14b53ca99123c1fe989')
+
+# Database connection pool configuration
+app.config['DB_POOL_MIN_SIZE'] = 2
+app.config['DB_POOL_MAX_SIZE'] = 10
+app.config['DB_POOL_CONNECTION_TIMEOUT'] = 30  # seconds to wait for a free connection
+app.config['DB_POOL_IDLE_TIMEOUT'] = 300  # seconds before a surplus idle connection is closed
+
+# Response cache configuration (disabled unless REDIS_URL is set)
+app.config['REDIS_URL'] = os.environ.get('REDIS_URL')
+app.config['CACHE_DEFAULT_TIMEOUT'] = 60  # seconds
+
+# Per-process key for remembering the last accepted password as an HMAC, never in plaintext
+_PASSWORD_MAC_KEY = secrets.token_bytes(32)
+_accepted_password_mac = None
+
+def verify_admin_password(password):
+    """Check a password against ADMIN_PASSWORD_HASH; repeats of an accepted password skip the KDF"""
+    global _accepted_password_mac
+    mac = hmac.new(_PASSWORD_MAC_KEY, password.encode(), hashlib.sha256).digest()
+    accepted = _accepted_password_mac
+    if accepted is not None and hmac.compare_digest(mac, accepted):
+        return True
+    # Failures are never remembered, so every wrong guess pays for a full scrypt
+    candidate = hashlib.scrypt(password.encode(), salt=ADMIN_PASSWORD_SALT, n=2**14, r=8, p=1, dklen=32)
+    if not hmac.compare_digest(candidate, ADMIN_PASSWORD_HASH):
+        return False
+    _accepted_password_mac = mac
+    return True
+
+# Runs of characters that are not letters, digits or underscore
+_SANITIZE_RE = re.compile(r'\W+')
+
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_db_connection():
-    """Get database connection with row factory for dict-like access"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+def safe_name(name):
+    """Lowercase a display name and replace unsafe characters for use in a filename"""
+    return _SANITIZE_RE.sub('_', name.lower()).strip('_') or 'file'
+
+class StaticFiles:
+    """Send requests for known static files to SharedDataMiddleware and everything else straight to the app"""
+
+    def __init__(self, wsgi_app, root, upload_dirs=()):
+        self.wsgi_app = wsgi_app
+        # SharedDataMiddleware streams files with wsgi.file_wrapper, which gunicorn
+        # implements with sendfile(2); cache_timeout=0 keeps browsers revalidating
+        self.shared_data = SharedDataMiddleware(wsgi_app, {'/': root}, cache_timeout=0)
+        # Other worker processes may add files here at any time, so these are always checked on disk
+        self.upload_prefixes = tuple(f'{directory}/' for directory in upload_dirs)
+        self.files = set()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            for filename in filenames:
+                relative_path = os.path.relpath(os.path.join(dirpath, filename), root)
+                self.files.add(relative_path.replace(os.sep, '/'))
+
+    def __call__(self, environ, start_response):
+        path = get_path_info(environ).lstrip('/')
+        # Set lookup instead of a stat() for API calls and probes for missing assets
+        if path in self.files or path.startswith(self.upload_prefixes):
+            return self.shared_data(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+app.wsgi_app = StaticFiles(app.wsgi_app, APP_ROOT, upload_dirs=('Product', 'Manufacturers', 'Banners'))
+
+def _spooled_fd(stream):
+    """File descriptor of an upload already spooled to disk, or None if it is held in memory"""
+    # Only a stream backed by a file has a name (SpooledTemporaryFile reports None until it
+    # rolls over); fileno() on an in-memory one would first force it onto disk
+    if getattr(stream, 'name', None) is None:
+        return None
+    try:
+        return stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+def save_upload(file, file_path):
+    """Write an uploaded file to disk; large uploads are copied in-kernel with sendfile(2)"""
+    src_fd = _spooled_fd(file.stream) if hasattr(os, 'sendfile') else None
+    if src_fd is not None:
+        size = os.fstat(src_fd).st_size
+        try:
+            with open(file_path, 'wb') as dst:
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(dst.fileno(), src_fd, offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            return
+        except OSError:
+            # Platforms without file-to-file sendfile (e.g. macOS) fall back below
+            file.stream.seek(0)
+    file.save(file_path)
+
+def _init_connection(conn):
+    """Apply per-connection SQLite tuning (WAL, relaxed fsync, larger caches)"""
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-64000')  # ~64MB page cache
+    # Reads through mmap come straight from the OS page cache, which every
+    # connection and worker process shares; private caches mostly hold dirty pages
+    conn.execute('PRAGMA mmap_size=268435456')  # 256MB memory-mapped I/O
+    conn.execute('PRAGMA foreign_keys=ON')
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections"""
+
+    def __init__(self, database_uri, min_size=2, max_size=10, connection_timeout=30, idle_timeout=300):
+        self.database_uri = database_uri
+        self.min_size = min_size
+        self.max_size = max_size
+        self.connection_timeout = connection_timeout
+        self.idle_timeout = idle_timeout
+        # LIFO so the most recently used (warmest) connection is handed out first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._total = 0
+
+        for _ in range(min_size):
+            self._total += 1
+            self._idle.put((self._create_connection(), time.monotonic()))
+
+    def _create_connection(self):
+        """Open a new connection with row factory for dict-like access"""
+        conn = sqlite3.connect(self.database_uri, uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _init_connection(conn)
+        return conn
+
+    def _discard(self, conn):
+        """Close a connection and remove it from the pool's accounting"""
+        with self._lock:
+            self._total -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def acquire(self):
+        """Borrow a connection, opening a new one while below max_size"""
+        now = time.monotonic()
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            # Close connections that sat idle too long, but never drop below min_size
+            if now - last_used > self.idle_timeout and self._total > self.min_size:
+                self._discard(conn)
+                continue
+            return conn
+
+        with self._lock:
+            can_create = self._total < self.max_size
+            if can_create:
+                self._total += 1
+
+        if can_create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._total -= 1
+                raise
+
+        try:
+            conn, _ = self._idle.get(timeout=self.connection_timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No database connection available after {self.connection_timeout}s')
+        return conn
+
+    def release(self, conn):
+        """Return a borrowed connection to the pool"""
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    def stats(self):
+        """Current pool usage counts"""
+        with self._lock:
+            total = self._total
+        idle = self._idle.qsize()
+        return {
+            'active': total - idle,
+            'idle': idle,
+            'total': total,
+            'min_size': self.min_size,
+            'max_size': self.max_size
+        }
+
+if not os.path.exists(DATABASE_PATH):
+    raise RuntimeError(f'{DATABASE_PATH} not found; run create_database.py first')
+
+db_pool = ConnectionPool(
+    DATABASE_URI,
+    min_size=app.config['DB_POOL_MIN_SIZE'],
+    max_size=app.config['DB_POOL_MAX_SIZE'],
+    connection_timeout=app.config['DB_POOL_CONNECTION_TIMEOUT'],
+    idle_timeout=app.config['DB_POOL_IDLE_TIMEOUT']
+)
+
+@contextmanager
+def get_connection():
+    """Borrow a pooled database connection for the duration of a with block"""
+    conn = db_pool.acquire()
+    try:
+        yield conn
+    finally:
+        db_pool.release(conn)
+
+# Tables whose changes are tracked in data_versions for ETag validation
+VERSIONED_TABLES = ('products', 'manufacturers', 'categories')
+
+def init_schema():
+    """Create lookup indexes, the products full-text index and version counters if missing (idempotent)"""
+    with get_connection() as conn:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'").fetchone() is None:
+            raise RuntimeError(f'{DATABASE_PATH} has no products table; run create_database.py first')
+        
+        # IMMEDIATE serializes concurrent workers booting against the same file
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category ON products(category)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_products_manufacturer ON products(manufacturer_id)')
+        # manufacturers.name is UNIQUE, so SQLite already maintains an index for m.name lookups
+
+        first_boot = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'"
+        ).fetchone() is None
+
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+            USING fts5(name, description, content='products', content_rowid='id')
+        ''')
+
+        # Keep the external-content index in sync with the products table
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO products_fts(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        ''')
+
+        if first_boot:
+            conn.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+        # Per-table change counters, stored in the database so every worker process agrees
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        for table in VERSIONED_TABLES:
+            conn.execute('INSERT OR IGNORE INTO data_versions (name) VALUES (?)', (table,))
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                conn.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table} BEGIN
+                        UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                    END
+                ''')
+        conn.commit()
+
+init_schema()
+
+def fts_query(search):
+    """Turn free-text search input into a safe FTS5 prefix query"""
+    # Quote every token so FTS5 operators and punctuation in user input are treated literally
+    return ' '.join('"' + token.replace('"', '""') + '"*' for token in search.split())
+
+def etag_versioned(*tables):
+    """Tag GET responses with a weak ETag built from table versions and answer matches with 304"""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            # Read versions before the view runs so a concurrent write can only make the tag older
+            with get_connection() as conn:
+                versions = dict(conn.execute(
+                    f'SELECT name, version FROM data_versions WHERE name IN ({", ".join("?" * len(tables))})',
+                    tables
+                ).fetchall())
+            etag = '-'.join(f'{table[0]}{versions.get(table, 0)}' for table in tables)
+            etag += f'-{zlib.crc32(request.full_path.encode()):08x}'
+            # cached() keys response bodies on this tag, so a new version never serves an old body
+            g.data_etag = etag
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            # Always revalidate: admin pages re-fetch right after their own edits
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def _build_products_query(by_category, by_manufacturer, by_search):
+    """SQL for one combination of get_products filters"""
+    query = '''
+        SELECT p.*, m.name as manufacturer_name, m.logo_path as manufacturer_logo
+        FROM products p
+        LEFT JOIN manufacturers m ON p.manufacturer_id = m.id
+    '''
+    conditions = []
+    
+    if by_category:
+        conditions.append('p.category = ?')
+    if by_manufacturer:
+        conditions.append('m.name = ?')
+    if by_search:
+        query += ' JOIN products_fts ON products_fts.rowid = p.id'
+        conditions.append('products_fts MATCH ?')
+    
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    
+    # Search results come back best match first; ties and plain listings stay alphabetical
+    if by_search:
+        return query + ' ORDER BY bm25(products_fts), p.name'
+    return query + ' ORDER BY p.name'
+
+# All 2^3 filter combinations, built once so requests only choose and bind
+PRODUCT_QUERIES = {
+    (by_category, by_manufacturer, by_search): _build_products_query(by_category, by_manufacturer, by_search)
+    for by_category in (False, True)
+    for by_manufacturer in (False, True)
+    for by_search in (False, True)
+}
+
+class ResponseCache:
+    """Redis-backed store for rendered GET responses; a no-op when Redis is unavailable"""
+
+    def __init__(self, url=None, max_connections=20):
+        self.client = None
+        if url and redis is not None:
+            pool = redis.ConnectionPool.from_url(url, max_connections=max_connections)
+            self.client = redis.Redis(connection_pool=pool)
+
+    def get(self, key):
+        """Return the cached body for key, or None on a miss"""
+        if self.client is None:
+            return None
+        try:
+            return self.client.get(key)
+        except redis.RedisError:
+            return None
+
+    def set(self, key, value, expire):
+        """Store a body for expire seconds"""
+        if self.client is None:
+            return
+        try:
+            self.client.set(key, value, ex=expire)
+        except redis.RedisError:
+            pass
+
+cache = ResponseCache(app.config['REDIS_URL'])
+
+def cached(prefix, expire=None):
+    """Cache successful JSON responses of a GET view under '<prefix>:<etag>:<full path>'
+
+    Must sit below etag_versioned, which supplies the tag. Any write, through the API
+    or not, bumps a table version and so changes the key; bodies cached under older
+    versions are never read again and simply expire.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = f'{prefix}:{g.data_etag}:{request.full_path}'
+            body = cache.get(key)
+            if body is not None:
+                return app.response_class(body, mimetype='application/json')
+
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                cache.set(key, response.get_data(), expire or app.config['CACHE_DEFAULT_TIMEOUT'])
+            return response
+        return wrapper
+    return decorator
+
+# JSON request payloads, decoded and validated in one pass by msgspec
+class AddProduct(msgspec.Struct):
+    name: str
+    category: str
+    manufacturer_id: int
+    description: str = ''
+    image_path: str = ''
+
+class AddManufacturer(msgspec.Struct):
+    name: str
+    description: str = ''
+    logo_path: str = ''
+    business_name: str = ''
+    business_address: str = ''
+    business_contact: str = ''
+    business_social_network: str = ''
+    banner_path: str = ''
+
+class AddCategory(msgspec.Struct):
+    name: str
+
+class Login(msgspec.Struct):
+    username: str
+    password: str
+
+def decode_body(payload_type):
+    """Decode the raw request body into payload_type; raises msgspec.DecodeError on bad input"""
+    # strict=False keeps accepting numeric strings such as "3" for integer fields
+    return msgspec.json.decode(request.get_data(cache=False), type=payload_type, strict=False)
+
+def ojson(obj, status=200):
+    """Serialize obj with orjson into a JSON response"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
 
 def dict_from_row(row):
     """Convert sqlite3.Row to dictionary"""
     return dict(row) if row else None
 
+def dicts_from_cursor(cursor):
+    """Convert all remaining rows to dictionaries, resolving column names only once"""
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+# (epoch second, ISO-8601 UTC string) of the last health check; load balancers probe many times a second
+_health_timestamp = (0, '')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({
+    global _health_timestamp
+    now = time.time_ns() // 1_000_000_000
+    if now != _health_timestamp[0]:
+        _health_timestamp = (now, time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now)))
+    return ojson({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': _health_timestamp[1],
         'database': DATABASE_PATH
     })
 
+@app.route('/api/pool-health', methods=['GET'])
+def pool_health():
+    """Database connection pool usage"""
+    return ojson(db_pool.stats())
+
 # Static file routes
+# Everything except the bare "/" is served by the StaticFiles middleware above
 @app.route('/')
 def index():
     """Serve the main index.html page"""
     return send_file('index.html')
 
-@app.route('/admin.html')
-def admin():
-    """Serve the admin panel"""
-    return send_file('admin.html')
-
-@app.route('/login.html')
-def login():
-    """Serve the login page"""
-    return send_file('login.html')
-
-@app.route('/<path:filename>')
-def serve_static(filename):
-    """Serve static files (CSS, JS, images)"""
-    if os.path.exists(filename):
-        return send_file(filename)
-    return "File not found", 404
-
 @app.route('/api/info', methods=['GET'])
 def api_info():
     """API information and available endpoints"""
-    return jsonify({
+    return ojson({
         'name': 'Khmer Products API',
         'version': '1.0.0',
         'endpoints': {
             'GET /api/health': 'Health check',
+            'GET /api/pool-health': 'Database connection pool usage',
             'GET /api/info': 'API information',
             'GET /api/manufacturers': 'Get all manufacturers',
-            'GET /api/products': 'Get all products (supports ?category=, ?manufacturer=, ?search=)',
+            'GET /api/products': 'Get all products (supports ?category=, ?manufacturer=, ?search= ranked by relevance)',
             'GET /api/products/<id>': 'Get specific product by ID',
             'GET /api/categories': 'Get all categories',
             'GET /api/stats': 'Get database statistics',
             'POST /api/products': 'Add new product',
+            'POST /api/products/bulk': 'Add many products from a JSON array',
             'POST /api/manufacturers': 'Add new manufacturer',
+            'POST /api/manufacturers/bulk': 'Add many manufacturers from a JSON array',
             'POST /api/upload/product-image': 'Upload product image file',
             'POST /api/upload/manufacturer-logo': 'Upload manufacturer logo file',
             'POST /api/upload/manufacturer-banner': 'Upload manufacturer banner file',
@@ -96,241 +557,220 @@ def api_info():
     })
 
 @app.route('/api/manufacturers', methods=['GET'])
+@etag_versioned('manufacturers')
+@cached('manufacturers')
 def get_manufacturers():
     """Get all manufacturers"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM manufacturers ORDER BY name')
-        manufacturers = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return jsonify(manufacturers)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples; names are bound once below
+            cursor.execute('SELECT * FROM manufacturers ORDER BY name')
+            manufacturers = dicts_from_cursor(cursor)
+        return ojson(manufacturers)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/products', methods=['GET'])
+@etag_versioned('products', 'manufacturers')
+@cached('products')
 def get_products():
     """Get products with optional filtering"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Base query
-        query = '''
-            SELECT p.*, m.name as manufacturer_name, m.logo_path as manufacturer_logo
-            FROM products p
-            LEFT JOIN manufacturers m ON p.manufacturer_id = m.id
-        '''
-        params = []
-        conditions = []
-        
-        # Add filters
         category = request.args.get('category')
         manufacturer = request.args.get('manufacturer')
         search = request.args.get('search')
-        
-        if category:
-            conditions.append('p.category = ?')
-            params.append(category)
-            
-        if manufacturer:
-            conditions.append('m.name = ?')
-            params.append(manufacturer)
-            
-        if search:
-            conditions.append('(p.name LIKE ? OR p.description LIKE ?)')
-            search_term = f'%{search}%'
-            params.extend([search_term, search_term])
-        
-        if conditions:
-            query += ' WHERE ' + ' AND '.join(conditions)
-            
-        query += ' ORDER BY p.name'
-        
-        cursor.execute(query, params)
-        products = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return jsonify(products)
+        search_query = fts_query(search) if search else ''
+        
+        # Pick the prepared variant; parameters bind in category, manufacturer, search order
+        query = PRODUCT_QUERIES[(bool(category), bool(manufacturer), bool(search_query))]
+        params = [value for value in (category, manufacturer, search_query) if value]
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples; names are bound once below
+            cursor.execute(query, params)
+            products = dicts_from_cursor(cursor)
+        return ojson(products)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
+@etag_versioned('products', 'manufacturers')
+@cached('products')
 def get_product(product_id):
     """Get a specific product by ID"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT p.*, m.name as manufacturer_name 
-            FROM products p
-            LEFT JOIN manufacturers m ON p.manufacturer_id = m.id
-            WHERE p.id = ?
-        ''', (product_id,))
-        
-        product = cursor.fetchone()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT p.*, m.name as manufacturer_name 
+                FROM products p
+                LEFT JOIN manufacturers m ON p.manufacturer_id = m.id
+                WHERE p.id = ?
+            ''', (product_id,))
+            product = cursor.fetchone()
         
         if not product:
-            return jsonify({'error': 'Product not found'}), 404
+            return ojson({'error': 'Product not found'}, 404)
             
-        return jsonify(dict_from_row(product)), 200
+        return ojson(dict_from_row(product), 200)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/manufacturers/<int:manufacturer_id>', methods=['GET'])
+@etag_versioned('manufacturers')
+@cached('manufacturers')
 def get_manufacturer(manufacturer_id):
     """Get a specific manufacturer by ID"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM manufacturers WHERE id = ?', (manufacturer_id,))
-        
-        manufacturer = cursor.fetchone()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM manufacturers WHERE id = ?', (manufacturer_id,))
+            manufacturer = cursor.fetchone()
         
         if not manufacturer:
-            return jsonify({'error': 'Manufacturer not found'}), 404
+            return ojson({'error': 'Manufacturer not found'}, 404)
             
-        return jsonify(dict_from_row(manufacturer)), 200
+        return ojson(dict_from_row(manufacturer), 200)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/categories', methods=['GET'])
+@etag_versioned('categories')
+@cached('categories')
 def get_categories():
     """Get all categories from categories table"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM categories ORDER BY name')
-        categories = [dict_from_row(row) for row in cursor.fetchall()]
-        conn.close()
-        return jsonify(categories)
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # plain tuples; names are bound once below
+            cursor.execute('SELECT * FROM categories ORDER BY name')
+            categories = dicts_from_cursor(cursor)
+        return ojson(categories)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/categories', methods=['POST'])
 def add_category():
     """Add a new category"""
     try:
-        data = request.get_json()
-        
-        if not data or 'name' not in data:
-            return jsonify({'error': 'Category name is required'}), 400
+        try:
+            data = decode_body(AddCategory)
+        except msgspec.DecodeError as e:
+            return ojson({'error': str(e)}, 400)
         
-        category_name = data['name'].strip()
+        category_name = data.name.strip()
         if not category_name:
-            return jsonify({'error': 'Category name cannot be empty'}), 400
+            return ojson({'error': 'Category name cannot be empty'}, 400)
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if category already exists
-        cursor.execute('SELECT id FROM categories WHERE name = ?', (category_name,))
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({'error': 'Category already exists'}), 409
-        
-        # Insert new category
-        cursor.execute('INSERT INTO categories (name) VALUES (?)', (category_name,))
-        category_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Check if category already exists
+            cursor.execute('SELECT id FROM categories WHERE name = ?', (category_name,))
+            if cursor.fetchone():
+                return ojson({'error': 'Category already exists'}, 409)
+            
+            # Insert new category
+            cursor.execute('INSERT INTO categories (name) VALUES (?)', (category_name,))
+            category_id = cursor.lastrowid
+            conn.commit()
         
-        return jsonify({
+        return ojson({
             'id': category_id,
             'name': category_name,
             'message': f'Category "{category_name}" created successfully'
-        }), 201
+        }, 201)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/categories/<int:category_id>', methods=['DELETE'])
 def delete_category(category_id):
     """Delete a category by ID (only if no products use it)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if category exists
-        cursor.execute('SELECT name FROM categories WHERE id = ?', (category_id,))
-        category = cursor.fetchone()
-        if not category:
-            conn.close()
-            return jsonify({'error': 'Category not found'}), 404
-        
-        category_name = category[0]
-        
-        # Check if any products use this category
-        cursor.execute('SELECT COUNT(*) FROM products WHERE category = ?', (category_name,))
-        product_count = cursor.fetchone()[0]
-        
-        if product_count > 0:
-            conn.close()
-            return jsonify({
-                'error': f'Cannot delete category "{category_name}" because {product_count} product(s) are using it'
-            }), 409
-        
-        # Delete the category
-        cursor.execute('DELETE FROM categories WHERE id = ?', (category_id,))
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Delete the category only if no products use it
+            category = cursor.execute('''
+                DELETE FROM categories
+                WHERE id = ? AND NOT EXISTS (SELECT 1 FROM products WHERE category = categories.name)
+                RETURNING name
+            ''', (category_id,)).fetchone()
+            
+            if not category:
+                # Nothing deleted: find out whether the category is missing or still in use
+                cursor.execute('''
+                    SELECT name, (SELECT COUNT(*) FROM products WHERE category = c.name)
+                    FROM categories c WHERE id = ?
+                ''', (category_id,))
+                in_use = cursor.fetchone()
+                if not in_use:
+                    return ojson({'error': 'Category not found'}, 404)
+                return ojson({
+                    'error': f'Cannot delete category "{in_use[0]}" because {in_use[1]} product(s) are using it'
+                }, 409)
+            
+            category_name = category[0]
+            conn.commit()
         
-        return jsonify({'message': f'Category "{category_name}" deleted successfully'})
+        return ojson({'message': f'Category "{category_name}" deleted successfully'})
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/stats', methods=['GET'])
+@etag_versioned('products', 'manufacturers')
+@cached('stats')
 def get_stats():
     """Get database statistics"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Get counts
-        cursor.execute('SELECT COUNT(*) FROM products')
-        product_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(*) FROM manufacturers')
-        manufacturer_count = cursor.fetchone()[0]
-        
-        cursor.execute('SELECT COUNT(DISTINCT category) FROM products')
-        category_count = cursor.fetchone()[0]
-        
-        # Get category breakdown
-        cursor.execute('SELECT category, COUNT(*) FROM products GROUP BY category ORDER BY COUNT(*) DESC')
-        category_stats = [{'category': row[0], 'count': row[1]} for row in cursor.fetchall()]
-        
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Get all counts in a single round-trip
+            cursor.execute('''
+                SELECT
+                    (SELECT COUNT(*) FROM products),
+                    (SELECT COUNT(*) FROM manufacturers),
+                    (SELECT COUNT(DISTINCT category) FROM products)
+            ''')
+            product_count, manufacturer_count, category_count = cursor.fetchone()
+            
+            # Get category breakdown
+            cursor.execute('SELECT category, COUNT(*) FROM products GROUP BY category ORDER BY 2 DESC')
+            category_stats = [{'category': row[0], 'count': row[1]} for row in cursor.fetchall()]
         
-        return jsonify({
+        return ojson({
             'total_products': product_count,
             'total_manufacturers': manufacturer_count,
             'total_categories': category_count,
             'category_breakdown': category_stats
         })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/upload/product-image', methods=['POST'])
 def upload_product_image():
     """Upload product image file"""
     try:
         if 'image' not in request.files:
-            return jsonify({'error': 'No image file provided'}), 400
+            return ojson({'error': 'No image file provided'}, 400)
             
         file = request.files['image']
         product_name = request.form.get('product_name', 'product')
         
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return ojson({'error': 'No file selected'}, 400)
             
         if file and allowed_file(file.filename):
             # Create safe filename
             file_extension = file.filename.rsplit('.', 1)[1].lower()
-            safe_product_name = ''.join(c if c.isalnum() else '_' for c in product_name.lower())
-            filename = f"{safe_product_name}_{int(datetime.now().timestamp())}.{file_extension}"
+            safe_product_name = safe_name(product_name)
+            timestamp = time.time_ns() // 1_000_000_000
+            filename = f"{safe_product_name}_{timestamp}.{file_extension}"
             
             # Ensure Product directory exists
             product_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'Product')
@@ -338,38 +778,39 @@ def upload_product_image():
             
             # Save file
             file_path = os.path.join(product_dir, filename)
-            file.save(file_path)
+            save_upload(file, file_path)
             
             # Return relative path for database storage
             relative_path = f"Product/{filename}"
-            return jsonify({
+            return ojson({
                 'message': 'Image uploaded successfully',
                 'file_path': relative_path
-            }), 201
+            }, 201)
         else:
-            return jsonify({'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}), 400
+            return ojson({'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}, 400)
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/upload/manufacturer-logo', methods=['POST'])
 def upload_manufacturer_logo():
     """Upload manufacturer logo file"""
     try:
         if 'logo' not in request.files:
-            return jsonify({'error': 'No logo file provided'}), 400
+            return ojson({'error': 'No logo file provided'}, 400)
             
         file = request.files['logo']
         manufacturer_name = request.form.get('manufacturer_name', 'manufacturer')
         
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return ojson({'error': 'No file selected'}, 400)
             
         if file and allowed_file(file.filename):
             # Create safe filename
             file_extension = file.filename.rsplit('.', 1)[1].lower()
-            safe_manufacturer_name = ''.join(c if c.isalnum() else '_' for c in manufacturer_name.lower())
-            filename = f"{safe_manufacturer_name}_logo_{int(datetime.now().timestamp())}.{file_extension}"
+            safe_manufacturer_name = safe_name(manufacturer_name)
+            timestamp = time.time_ns() // 1_000_000_000
+            filename = f"{safe_manufacturer_name}_logo_{timestamp}.{file_extension}"
             
             # Ensure Manufacturers directory exists
             manufacturers_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'Manufacturers')
@@ -377,38 +818,39 @@ def upload_manufacturer_logo():
             
             # Save file
             file_path = os.path.join(manufacturers_dir, filename)
-            file.save(file_path)
+            save_upload(file, file_path)
             
             # Return relative path for database storage
             relative_path = f"Manufacturers/{filename}"
-            return jsonify({
+            return ojson({
                 'message': 'Logo uploaded successfully',
                 'file_path': relative_path
-            }), 201
+            }, 201)
         else:
-            return jsonify({'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}), 400
+            return ojson({'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}, 400)
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/upload/manufacturer-banner', methods=['POST'])
 def upload_manufacturer_banner():
     """Upload manufacturer banner file"""
     try:
         if 'banner' not in request.files:
-            return jsonify({'error': 'No banner file provided'}), 400
+            return ojson({'error': 'No banner file provided'}, 400)
             
         file = request.files['banner']
         manufacturer_name = request.form.get('manufacturer_name', 'manufacturer')
         
         if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
+            return ojson({'error': 'No file selected'}, 400)
             
         if file and allowed_file(file.filename):
             # Create safe filename
             file_extension = file.filename.rsplit('.', 1)[1].lower()
-            safe_manufacturer_name = ''.join(c if c.isalnum() else '_' for c in manufacturer_name.lower())
-            filename = f"{safe_manufacturer_name}_banner_{int(datetime.now().timestamp())}.{file_extension}"
+            safe_manufacturer_name = safe_name(manufacturer_name)
+            timestamp = time.time_ns() // 1_000_000_000
+            filename = f"{safe_manufacturer_name}_banner_{timestamp}.{file_extension}"
             
             # Ensure Banners directory exists
             banners_dir = os.path.join(app.config['UPLOAD_FOLDER'], 'Banners')
@@ -416,123 +858,199 @@ def upload_manufacturer_banner():
             
             # Save file
             file_path = os.path.join(banners_dir, filename)
-            file.save(file_path)
+            save_upload(file, file_path)
             
             # Return relative path for database storage
             relative_path = f"Banners/{filename}"
-            return jsonify({
+            return ojson({
                 'message': 'Banner uploaded successfully',
                 'file_path': relative_path
-            }), 201
+            }, 201)
         else:
-            return jsonify({'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}), 400
+            return ojson({'error': 'Invalid file type. Allowed: PNG, JPG, JPEG, GIF, WEBP'}, 400)
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
+
+def product_conflict(error):
+    """Response for a product write that broke a constraint"""
+    if 'FOREIGN KEY' in str(error):
+        return ojson({'error': 'Manufacturer not found'}, 400)
+    if 'UNIQUE' in str(error):
+        return ojson({'error': 'A product with this name already exists for this manufacturer'}, 409)
+    return ojson({'error': str(error)}, 409)
+
+def discard_uploads(file_paths):
+    """Remove files saved for a request whose database write did not go through"""
+    for file_path in file_paths:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
 
 @app.route('/api/products', methods=['POST'])
 def add_product():
     """Add new product"""
     try:
-        data = request.get_json()
-        required_fields = ['name', 'category', 'manufacturer_id']
-        
-        if not all(field in data for field in required_fields):
-            return jsonify({'error': 'Missing required fields'}), 400
-            
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO products (name, category, description, image_path, manufacturer_id)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            data['name'],
-            data['category'],
-            data.get('description', ''),
-            data.get('image_path', ''),
-            data['manufacturer_id']
-        ))
-        
-        product_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            data = decode_body(AddProduct)
+        except msgspec.DecodeError as e:
+            return ojson({'error': str(e)}, 400)
+            
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO products (name, category, description, image_path, manufacturer_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (data.name, data.category, data.description, data.image_path, data.manufacturer_id))
+            
+            product_id = cursor.lastrowid
+            conn.commit()
         
-        return jsonify({'id': product_id, 'message': 'Product added successfully'}), 201
+        return ojson({'id': product_id, 'message': 'Product added successfully'}, 201)
+    except sqlite3.IntegrityError as e:
+        # ux_products_name_mfr, or a manufacturer_id with no manufacturer
+        return product_conflict(e)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
+
+@app.route('/api/products/bulk', methods=['POST'])
+def add_products_bulk():
+    """Add many products in a single transaction"""
+    try:
+        try:
+            items = decode_body(list[AddProduct])
+        except msgspec.DecodeError as e:
+            return ojson({'error': str(e)}, 400)
+        
+        if not items:
+            return ojson({'error': 'Expected a non-empty JSON array of products'}, 400)
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO products (name, category, description, image_path, manufacturer_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [
+                (data.name, data.category, data.description, data.image_path, data.manufacturer_id)
+                for data in items
+            ])
+            
+            # Rows inserted in one transaction receive consecutive ids
+            last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+            conn.commit()
+        
+        product_ids = list(range(last_id - len(items) + 1, last_id + 1))
+        return ojson({'ids': product_ids, 'message': f'{len(product_ids)} products added successfully'}, 201)
+    except sqlite3.IntegrityError as e:
+        # The whole batch is rolled back when the connection goes back to the pool
+        return product_conflict(e)
+    except Exception as e:
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/manufacturers', methods=['POST'])
 def add_manufacturer():
     """Add new manufacturer"""
     try:
-        data = request.get_json()
-        
-        if 'name' not in data:
-            return jsonify({'error': 'Name is required'}), 400
-            
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO manufacturers (name, description, logo_path, business_name, business_address, business_contact, business_social_network, banner_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            data['name'],
-            data.get('description', ''),
-            data.get('logo_path', ''),
-            data.get('business_name', ''),
-            data.get('business_address', ''),
-            data.get('business_contact', ''),
-            data.get('business_social_network', ''),
-            data.get('banner_path', '')
-        ))
-        
-        manufacturer_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            data = decode_body(AddManufacturer)
+        except msgspec.DecodeError as e:
+            return ojson({'error': str(e)}, 400)
+            
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('''
+                    INSERT INTO manufacturers (name, description, logo_path, business_name, business_address, business_contact, business_social_network, banner_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    data.name,
+                    data.description,
+                    data.logo_path,
+                    data.business_name,
+                    data.business_address,
+                    data.business_contact,
+                    data.business_social_network,
+                    data.banner_path
+                ))
+            except sqlite3.IntegrityError:
+                # manufacturers.name is UNIQUE
+                conn.rollback()
+                return ojson({'error': f'Manufacturer "{data.name}" already exists'}, 409)
+            
+            manufacturer_id = cursor.lastrowid
+            conn.commit()
+        
+        return ojson({'id': manufacturer_id, 'message': 'Manufacturer added successfully'}, 201)
+    except Exception as e:
+        return ojson({'error': str(e)}, 500)
+
+@app.route('/api/manufacturers/bulk', methods=['POST'])
+def add_manufacturers_bulk():
+    """Add many manufacturers in a single transaction"""
+    try:
+        try:
+            items = decode_body(list[AddManufacturer])
+        except msgspec.DecodeError as e:
+            return ojson({'error': str(e)}, 400)
+        
+        if not items:
+            return ojson({'error': 'Expected a non-empty JSON array of manufacturers'}, 400)
+        
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany('''
+                    INSERT INTO manufacturers (name, description, logo_path, business_name, business_address, business_contact, business_social_network, banner_path)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(
+                    data.name,
+                    data.description,
+                    data.logo_path,
+                    data.business_name,
+                    data.business_address,
+                    data.business_contact,
+                    data.business_social_network,
+                    data.banner_path
+                ) for data in items])
+            except sqlite3.IntegrityError:
+                # A name already in manufacturers, or repeated in the request; none of the batch is kept
+                conn.rollback()
+                return ojson({'error': 'One or more manufacturers already exist'}, 409)
+            
+            # Rows inserted in one transaction receive consecutive ids
+            last_id = cursor.execute('SELECT last_insert_rowid()').fetchone()[0]
+            conn.commit()
         
-        return jsonify({'id': manufacturer_id, 'message': 'Manufacturer added successfully'}), 201
+        manufacturer_ids = list(range(last_id - len(items) + 1, last_id + 1))
+        return ojson({'ids': manufacturer_ids, 'message': f'{len(manufacturer_ids)} manufacturers added successfully'}, 201)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
     """Delete a product by ID"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if product exists
-        cursor.execute('SELECT name FROM products WHERE id = ?', (product_id,))
-        product = cursor.fetchone()
-        
-        if not product:
-            conn.close()
-            return jsonify({'error': 'Product not found'}), 404
+        with get_connection() as conn:
+            cursor = conn.cursor()
             
-        # Delete the product
-        cursor.execute('DELETE FROM products WHERE id = ?', (product_id,))
-        conn.commit()
-        conn.close()
+            product = cursor.execute('DELETE FROM products WHERE id = ? RETURNING name', (product_id,)).fetchone()
+            
+            if not product:
+                return ojson({'error': 'Product not found'}, 404)
+                
+            conn.commit()
         
-        return jsonify({'message': f'Product "{product["name"]}" deleted successfully'}), 200
+        return ojson({'message': f'Product "{product["name"]}" deleted successfully'}, 200)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     """Update a product by ID"""
+    # Uploads saved below are removed again on every path that does not commit
+    saved_files = []
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if product exists
-        cursor.execute('SELECT * FROM products WHERE id = ?', (product_id,))
-        existing_product = cursor.fetchone()
-        
-        if not existing_product:
-            conn.close()
-            return jsonify({'error': 'Product not found'}), 404
-        
         # Get form data
         name = request.form.get('name')
         category = request.form.get('category')
@@ -541,58 +1059,60 @@ def update_product(product_id):
         
         # Validate required fields
         if not all([name, category, manufacturer_id]):
-            conn.close()
-            return jsonify({'error': 'Name, category, and manufacturer are required'}), 400
+            return ojson({'error': 'Name, category, and manufacturer are required'}, 400)
         
         # Handle image upload if provided
-        image_path = existing_product['image_path']  # Keep existing image by default
+        image_path = None  # Keep existing image by default
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
                 # Generate unique filename
-                timestamp = int(datetime.now().timestamp())
-                filename = f"{secure_filename(name.lower().replace(' ', '_'))}_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
+                timestamp = time.time_ns() // 1_000_000_000
+                filename = f"{safe_name(name)}_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
                 
                 # Save to Product folder
                 product_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'Product')
                 os.makedirs(product_folder, exist_ok=True)
                 file_path = os.path.join(product_folder, filename)
-                file.save(file_path)
+                save_upload(file, file_path)
+                saved_files.append(file_path)
                 image_path = f"Product/{filename}"
         
-        # Update product in database
-        cursor.execute('''
-            UPDATE products 
-            SET name = ?, category = ?, manufacturer_id = ?, description = ?, image_path = ?
-            WHERE id = ?
-        ''', (name, category, manufacturer_id, description, image_path, product_id))
-        
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Update product in database; no returned row means it does not exist
+            updated = cursor.execute('''
+                UPDATE products 
+                SET name = ?, category = ?, manufacturer_id = ?, description = ?, image_path = COALESCE(?, image_path)
+                WHERE id = ?
+                RETURNING id
+            ''', (name, category, manufacturer_id, description, image_path, product_id)).fetchone()
+            
+            if not updated:
+                discard_uploads(saved_files)
+                return ojson({'error': 'Product not found'}, 404)
+            
+            conn.commit()
         
-        return jsonify({
+        return ojson({
             'message': f'Product "{name}" updated successfully',
             'product_id': product_id
-        }), 200
+        }, 200)
         
+    except sqlite3.IntegrityError as e:
+        discard_uploads(saved_files)
+        return product_conflict(e)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        discard_uploads(saved_files)
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/manufacturers/<int:manufacturer_id>', methods=['PUT'])
 def update_manufacturer(manufacturer_id):
     """Update a manufacturer by ID"""
+    # Uploads saved below are removed again on every path that does not commit
+    saved_files = []
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if manufacturer exists
-        cursor.execute('SELECT * FROM manufacturers WHERE id = ?', (manufacturer_id,))
-        existing_manufacturer = cursor.fetchone()
-        
-        if not existing_manufacturer:
-            conn.close()
-            return jsonify({'error': 'Manufacturer not found'}), 404
-        
         # Get form data
         name = request.form.get('name')
         description = request.form.get('description', '')
@@ -603,118 +1123,135 @@ def update_manufacturer(manufacturer_id):
         
         # Validate required fields
         if not name:
-            conn.close()
-            return jsonify({'error': 'Name is required'}), 400
+            return ojson({'error': 'Name is required'}, 400)
         
         # Handle logo upload if provided
-        logo_path = existing_manufacturer['logo_path']  # Keep existing logo by default
+        logo_path = None  # Keep existing logo by default
         if 'logo' in request.files:
             file = request.files['logo']
             if file and file.filename != '' and allowed_file(file.filename):
                 # Generate unique filename
-                timestamp = int(datetime.now().timestamp())
-                filename = f"{secure_filename(name.lower().replace(' ', '_'))}_logo_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
+                timestamp = time.time_ns() // 1_000_000_000
+                filename = f"{safe_name(name)}_logo_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
                 
                 # Save to Manufacturers folder
                 manufacturer_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'Manufacturers')
                 os.makedirs(manufacturer_folder, exist_ok=True)
                 file_path = os.path.join(manufacturer_folder, filename)
-                file.save(file_path)
+                save_upload(file, file_path)
+                saved_files.append(file_path)
                 logo_path = f"Manufacturers/{filename}"
         
         # Handle banner upload if provided
-        banner_path = existing_manufacturer['banner_path']  # Keep existing banner by default
+        banner_path = None  # Keep existing banner by default
         if 'banner' in request.files:
             file = request.files['banner']
             if file and file.filename != '' and allowed_file(file.filename):
                 # Generate unique filename
-                timestamp = int(datetime.now().timestamp())
-                filename = f"{secure_filename(name.lower().replace(' ', '_'))}_banner_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
+                timestamp = time.time_ns() // 1_000_000_000
+                filename = f"{safe_name(name)}_banner_{timestamp}.{file.filename.rsplit('.', 1)[1].lower()}"
                 
                 # Save to Manufacturers folder
                 manufacturer_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'Manufacturers')
                 os.makedirs(manufacturer_folder, exist_ok=True)
                 file_path = os.path.join(manufacturer_folder, filename)
-                file.save(file_path)
+                save_upload(file, file_path)
+                saved_files.append(file_path)
                 banner_path = f"Manufacturers/{filename}"
         
-        # Update manufacturer in database
-        cursor.execute('''
-            UPDATE manufacturers 
-            SET name = ?, description = ?, logo_path = ?, business_name = ?, business_address = ?, business_contact = ?, business_social_network = ?, banner_path = ?
-            WHERE id = ?
-        ''', (name, description, logo_path, business_name, business_address, business_contact, business_social_network, banner_path, manufacturer_id))
-        
-        conn.commit()
-        conn.close()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Update manufacturer in database; no returned row means it does not exist
+            updated = cursor.execute('''
+                UPDATE manufacturers 
+                SET name = ?, description = ?, logo_path = COALESCE(?, logo_path), business_name = ?, business_address = ?, business_contact = ?, business_social_network = ?, banner_path = COALESCE(?, banner_path)
+                WHERE id = ?
+                RETURNING id
+            ''', (name, description, logo_path, business_name, business_address, business_contact, business_social_network, banner_path, manufacturer_id)).fetchone()
+            
+            if not updated:
+                discard_uploads(saved_files)
+                return ojson({'error': 'Manufacturer not found'}, 404)
+            
+            conn.commit()
         
-        return jsonify({
+        return ojson({
             'message': f'Manufacturer "{name}" updated successfully',
             'manufacturer_id': manufacturer_id
-        }), 200
+        }, 200)
         
+    except sqlite3.IntegrityError:
+        # manufacturers.name is UNIQUE
+        discard_uploads(saved_files)
+        return ojson({'error': 'A manufacturer with this name already exists'}, 409)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        discard_uploads(saved_files)
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/manufacturers/<int:manufacturer_id>', methods=['DELETE'])
 def delete_manufacturer(manufacturer_id):
     """Delete a manufacturer by ID (only if no products reference it)"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Check if manufacturer exists
-        cursor.execute('SELECT name FROM manufacturers WHERE id = ?', (manufacturer_id,))
-        manufacturer = cursor.fetchone()
-        
-        if not manufacturer:
-            conn.close()
-            return jsonify({'error': 'Manufacturer not found'}), 404
+        with get_connection() as conn:
+            cursor = conn.cursor()
             
-        # Check if any products reference this manufacturer
-        cursor.execute('SELECT COUNT(*) as count FROM products WHERE manufacturer_id = ?', (manufacturer_id,))
-        product_count = cursor.fetchone()['count']
-        
-        if product_count > 0:
-            conn.close()
-            return jsonify({'error': f'Cannot delete manufacturer. {product_count} products are still associated with this manufacturer.'}), 400
+            # Delete the manufacturer only if no products reference it
+            manufacturer = cursor.execute('''
+                DELETE FROM manufacturers
+                WHERE id = ? AND NOT EXISTS (SELECT 1 FROM products WHERE manufacturer_id = ?)
+                RETURNING name
+            ''', (manufacturer_id, manufacturer_id)).fetchone()
             
-        # Delete the manufacturer
-        cursor.execute('DELETE FROM manufacturers WHERE id = ?', (manufacturer_id,))
-        conn.commit()
-        conn.close()
+            if not manufacturer:
+                # Nothing deleted: find out whether the manufacturer is missing or still referenced
+                cursor.execute('''
+                    SELECT (SELECT COUNT(*) FROM products WHERE manufacturer_id = m.id) as count
+                    FROM manufacturers m WHERE id = ?
+                ''', (manufacturer_id,))
+                in_use = cursor.fetchone()
+                if not in_use:
+                    return ojson({'error': 'Manufacturer not found'}, 404)
+                return ojson({'error': f'Cannot delete manufacturer. {in_use["count"]} products are still associated with this manufacturer.'}, 400)
+                
+            conn.commit()
         
-        return jsonify({'message': f'Manufacturer "{manufacturer["name"]}" deleted successfully'}), 200
+        return ojson({'message': f'Manufacturer "{manufacturer["name"]}" deleted successfully'}, 200)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
 
 @app.route('/api/login', methods=['POST'])
 def login_admin():
     """Authenticate admin user"""
     try:
-        data = request.get_json()
-        
-        if not data or 'username' not in data or 'password' not in data:
-            return jsonify({'error': 'Username and password are required'}), 400
+        try:
+            data = decode_body(Login)
+        except msgspec.DecodeError:
+            return ojson({'error': 'Username and password are required'}, 400)
             
-        username = data['username']
-        password = data['password']
+        username = data.username
         
-        # Server-side credential validation
-        if username == 'cbsdigitaladmin' and password == 'OVMcKPRLJ78sJEC':
-            return jsonify({
+        # Server-side credential validation; both checks always run and compare in constant time
+        username_ok = hmac.compare_digest(username.encode(), ADMIN_USERNAME.encode())
+        password_ok = verify_admin_password(data.password)
+        if username_ok & password_ok:
+            return ojson({
                 'success': True,
                 'message': 'Login successful',
                 'user': username
-            }), 200
+            }, 200)
         else:
-            return jsonify({
+            return ojson({
                 'success': False,
                 'error': 'Invalid username or password'
-            }), 401
+            }, 401)
             
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return ojson({'error': str(e)}, 500)
+
+# ASGI entry point: the server keeps accepting connections while requests run in a thread pool
+# uvicorn api_server:asgi_app --workers 4 --loop uvloop --http httptools --host 0.0.0.0 --port $PORT
+asgi_app = WsgiToAsgi(app)
 
 # Main execution block removed for modular design
 # Use app.py to run the application locally
\ No newline at end of file
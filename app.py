@@ -2,6 +2,12 @@
 """
 Main entry point for localhost development
 Imports the Flask app from api_server.py
+
+The built-in server below is single-process and meant for development only.
+In production run the app under gunicorn (see Procfile):
+    gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:$PORT app:app
+or, as ASGI, under uvicorn:
+    uvicorn api_server:asgi_app --workers 4 --loop uvloop --http httptools --host 0.0.0.0 --port $PORT
 """
 
 from api_server import app
@@ -9,17 +9,51 @@ import os
 import json
 from datetime import datetime
 
+# Products joined with their manufacturer's details; shared by the view and its materialized copy
+PRODUCTS_WITH_MANUFACTURERS_SELECT = '''
+        SELECT 
+            p.id,
+            p.name,
+            p.category,
+            p.description,
+            p.image_path,
+            m.name as manufacturer_name,
+            m.description as manufacturer_description,
+            m.logo_path as manufacturer_logo,
+            p.created_at,
+            p.updated_at
+        FROM products p
+        LEFT JOIN manufacturers m ON p.manufacturer_id = m.id
+'''
+
+def configure_connection(conn, db_path):
+    """
+    Apply the journal and cache PRAGMAs used for every connection to the database.
+    """
+    # WAL lets readers run alongside a writer and only fsyncs at checkpoints;
+    # an in-memory database has no journal file to put in WAL mode
+    if db_path != ':memory:':
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")
+    conn.execute("PRAGMA mmap_size=268435456")
+
 def create_database(db_path='khmer_products.db'):
     """
     Create the SQLite database with manufacturers and products tables.
     """
-    # Remove existing database if it exists
+    # Remove existing database (and any WAL files left next to it) if it exists
     if os.path.exists(db_path):
         os.remove(db_path)
         print(f"Removed existing database: {db_path}")
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
     
-    # Create new database connection
-    conn = sqlite3.connect(db_path)
+    # Create new database connection; transactions are begun explicitly (see populate_database)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    configure_connection(conn, db_path)
     cursor = conn.cursor()
     
     # Create manufacturers table
@@ -67,6 +101,11 @@ def create_database(db_path='khmer_products.db'):
     cursor.execute('CREATE INDEX idx_products_manufacturer ON products(manufacturer_id)')
     cursor.execute('CREATE INDEX idx_products_name ON products(name)')
     
+    # Covering indexes: seeding (or reseeding) the roll-up tables groups and counts
+    # straight from the index pages; after that, triggers keep the counts current
+    cursor.execute('CREATE INDEX idx_products_cover ON products(manufacturer_id, category, name, image_path)')
+    cursor.execute('CREATE INDEX idx_products_category_mfr ON products(category, manufacturer_id)')
+    
     print("Database schema created successfully!")
     return conn, cursor
 
@@ -74,6 +113,8 @@ def populate_database(conn, cursor):
     """
     Populate the database with the existing data from the JavaScript file.
     """
+    # Take the write lock once and insert every seed row in a single transaction
+    cursor.execute("BEGIN IMMEDIATE")
     
     # Insert manufacturers data
     manufacturers_data = [
@@ -122,60 +163,285 @@ def populate_database(conn, cursor):
     ''', products_data)
     
     # Commit the changes
-    conn.commit()
+    cursor.execute("COMMIT")
     print(f"Database populated with {len(manufacturers_data)} manufacturers and {len(products_data)} products!")
 
 def create_views(conn, cursor):
     """
     Create useful views for common queries.
     """
+    cursor.execute("BEGIN IMMEDIATE")
     
     # View for products with manufacturer details
+    cursor.execute('CREATE VIEW products_with_manufacturers AS' + PRODUCTS_WITH_MANUFACTURERS_SELECT)
+    
+    cursor.execute("COMMIT")
+    print("Database views created successfully!")
+
+def create_materialized_tables(conn, cursor):
+    """
+    Materialize products_with_manufacturers into a table kept current by triggers.
+    Safe to run again on an existing database.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    
     cursor.execute('''
-        CREATE VIEW products_with_manufacturers AS
-        SELECT 
-            p.id,
-            p.name,
-            p.category,
-            p.description,
-            p.image_path,
-            m.name as manufacturer_name,
-            m.description as manufacturer_description,
-            m.logo_path as manufacturer_logo,
-            p.created_at,
-            p.updated_at
-        FROM products p
-        LEFT JOIN manufacturers m ON p.manufacturer_id = m.id
+        CREATE TABLE IF NOT EXISTS products_with_manufacturers_mat (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            category TEXT,
+            description TEXT,
+            image_path TEXT,
+            manufacturer_name TEXT,
+            manufacturer_description TEXT,
+            manufacturer_logo TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pwm_mat_name ON products_with_manufacturers_mat(name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pwm_mat_category ON products_with_manufacturers_mat(category, name)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pwm_mat_manufacturer ON products_with_manufacturers_mat(manufacturer_name, name)')
+    
+    # Refresh the rows of the products a change touches. An upsert rather than INSERT OR REPLACE,
+    # so the row's own UPDATE triggers (see create_search_index) fire for rows that already exist
+    columns = ['name', 'category', 'description', 'image_path', 'manufacturer_name',
+               'manufacturer_description', 'manufacturer_logo', 'created_at', 'updated_at']
+    upsert = 'ON CONFLICT(id) DO UPDATE SET ' + ', '.join(f'{column} = excluded.{column}' for column in columns)
+    
+    def refresh(where):
+        return f'INSERT INTO products_with_manufacturers_mat {PRODUCTS_WITH_MANUFACTURERS_SELECT} WHERE {where} {upsert};'
+    
+    triggers = {
+        'products_mat_ai': ('AFTER INSERT ON products', refresh('p.id = NEW.id')),
+        'products_mat_au': ('AFTER UPDATE ON products',
+                            'DELETE FROM products_with_manufacturers_mat WHERE id = OLD.id AND OLD.id != NEW.id;'
+                            + refresh('p.id = NEW.id')),
+        'products_mat_ad': ('AFTER DELETE ON products', 'DELETE FROM products_with_manufacturers_mat WHERE id = OLD.id;'),
+        'manufacturers_mat_ai': ('AFTER INSERT ON manufacturers', refresh('p.manufacturer_id = NEW.id')),
+        'manufacturers_mat_au': ('AFTER UPDATE ON manufacturers', refresh('p.manufacturer_id IN (OLD.id, NEW.id)')),
+        'manufacturers_mat_ad': ('AFTER DELETE ON manufacturers', refresh('p.manufacturer_id = OLD.id')),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
     
-    # View for category statistics
+    # Rebuild from the base tables so rows written before the triggers existed are included
+    cursor.execute('DELETE FROM products_with_manufacturers_mat')
+    cursor.execute(refresh('1'))
+    
+    cursor.execute("COMMIT")
+    print("Materialized tables created successfully!")
+
+def create_category_triggers(conn, cursor):
+    """
+    Keep the categories table listing every category a product uses.
+    Safe to run again on an existing database.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    
+    add_category = 'INSERT OR IGNORE INTO categories (name) VALUES (NEW.category);'
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS products_category_ai AFTER INSERT ON products BEGIN {add_category} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS products_category_au AFTER UPDATE OF category ON products BEGIN {add_category} END')
+    
+    # Backfill categories written before the triggers existed
+    cursor.execute('INSERT OR IGNORE INTO categories (name) SELECT DISTINCT category FROM products')
+    
+    cursor.execute("COMMIT")
+    print("Category triggers created successfully!")
+
+def create_product_key(conn, cursor):
+    """
+    Make (name, manufacturer_id) unique in products, so imports can skip
+    products that already exist. Safe to run again on an existing database.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    
+    # Drop duplicates left from before the index existed, keeping the first of each
     cursor.execute('''
-        CREATE VIEW category_stats AS
-        SELECT 
-            category,
-            COUNT(*) as product_count,
-            COUNT(DISTINCT manufacturer_id) as manufacturer_count
+        DELETE FROM products
+        WHERE manufacturer_id IS NOT NULL
+          AND id NOT IN (SELECT MIN(id) FROM products GROUP BY name, manufacturer_id)
+    ''')
+    if cursor.rowcount:
+        print(f"Removed {cursor.rowcount} duplicate products")
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_products_name_mfr ON products(name, manufacturer_id)')
+    
+    cursor.execute("COMMIT")
+    print("Product key created successfully!")
+
+def create_rollup_tables(conn, cursor):
+    """
+    Create the category_stats and manufacturer_stats roll-up tables, kept current by triggers.
+    Safe to run again on an existing database, including one where they are still views.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    
+    for name in ('category_stats', 'manufacturer_stats'):
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,))
+        if cursor.fetchone() == ('view',):
+            cursor.execute(f'DROP VIEW {name}')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_stats (
+            category TEXT PRIMARY KEY,
+            product_count INTEGER NOT NULL,
+            manufacturer_count INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS manufacturer_stats (
+            manufacturer_id INTEGER PRIMARY KEY,
+            manufacturer_name TEXT,
+            description TEXT,
+            product_count INTEGER NOT NULL,
+            category_count INTEGER NOT NULL
+        )
+    ''')
+    
+    # Products per (category, manufacturer) pair. The distinct counts in the stats tables only
+    # change when a pair appears or disappears, so every trigger below adjusts a few rows by +-1
+    # instead of recounting. Products without a manufacturer are kept under manufacturer_id 0.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_manufacturer_counts (
+            category TEXT NOT NULL,
+            manufacturer_id INTEGER NOT NULL,
+            product_count INTEGER NOT NULL,
+            PRIMARY KEY (category, manufacturer_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    def add_product(category, manufacturer_id):
+        pair = f"category = {category} AND manufacturer_id = IFNULL({manufacturer_id}, 0)"
+        new_pair = f"(SELECT product_count = 1 FROM category_manufacturer_counts WHERE {pair})"
+        return f'''
+            INSERT INTO category_manufacturer_counts (category, manufacturer_id, product_count)
+            VALUES ({category}, IFNULL({manufacturer_id}, 0), 1)
+            ON CONFLICT(category, manufacturer_id) DO UPDATE SET product_count = product_count + 1;
+            INSERT INTO category_stats (category, product_count, manufacturer_count)
+            VALUES ({category}, 1, {manufacturer_id} IS NOT NULL)
+            ON CONFLICT(category) DO UPDATE SET
+                product_count = product_count + 1,
+                manufacturer_count = manufacturer_count + ({manufacturer_id} IS NOT NULL AND {new_pair});
+            UPDATE manufacturer_stats SET
+                product_count = product_count + 1,
+                category_count = category_count + {new_pair}
+            WHERE manufacturer_id = {manufacturer_id};
+        '''
+    
+    def remove_product(category, manufacturer_id):
+        pair = f"category = {category} AND manufacturer_id = IFNULL({manufacturer_id}, 0)"
+        gone_pair = f"(SELECT product_count = 0 FROM category_manufacturer_counts WHERE {pair})"
+        return f'''
+            UPDATE category_manufacturer_counts SET product_count = product_count - 1 WHERE {pair};
+            UPDATE category_stats SET
+                product_count = product_count - 1,
+                manufacturer_count = manufacturer_count - ({manufacturer_id} IS NOT NULL AND {gone_pair})
+            WHERE category = {category};
+            DELETE FROM category_stats WHERE category = {category} AND product_count = 0;
+            UPDATE manufacturer_stats SET
+                product_count = product_count - 1,
+                category_count = category_count - {gone_pair}
+            WHERE manufacturer_id = {manufacturer_id};
+            DELETE FROM category_manufacturer_counts WHERE {pair} AND product_count = 0;
+        '''
+    
+    # A manufacturer's row is rebuilt from its pairs, one per category it has products in
+    def recount_manufacturer(manufacturer_id):
+        return f'''
+            INSERT INTO manufacturer_stats (manufacturer_id, manufacturer_name, description, product_count, category_count)
+            SELECT m.id, m.name, m.description,
+                   (SELECT IFNULL(SUM(product_count), 0) FROM category_manufacturer_counts WHERE manufacturer_id = m.id),
+                   (SELECT COUNT(*) FROM category_manufacturer_counts WHERE manufacturer_id = m.id)
+            FROM manufacturers m
+            WHERE m.id = {manufacturer_id}
+            ON CONFLICT(manufacturer_id) DO UPDATE SET
+                manufacturer_name = excluded.manufacturer_name,
+                description = excluded.description,
+                product_count = excluded.product_count,
+                category_count = excluded.category_count;
+        '''
+    
+    triggers = {
+        'products_stats_ai': ('AFTER INSERT ON products', add_product('NEW.category', 'NEW.manufacturer_id')),
+        'products_stats_au': ('AFTER UPDATE OF category, manufacturer_id ON products',
+                              remove_product('OLD.category', 'OLD.manufacturer_id')
+                              + add_product('NEW.category', 'NEW.manufacturer_id')),
+        'products_stats_ad': ('AFTER DELETE ON products', remove_product('OLD.category', 'OLD.manufacturer_id')),
+        'manufacturers_stats_ai': ('AFTER INSERT ON manufacturers', recount_manufacturer('NEW.id')),
+        'manufacturers_stats_au': ('AFTER UPDATE ON manufacturers',
+                                   'DELETE FROM manufacturer_stats WHERE manufacturer_id = OLD.id;'
+                                   + recount_manufacturer('NEW.id')),
+        'manufacturers_stats_ad': ('AFTER DELETE ON manufacturers',
+                                   'DELETE FROM manufacturer_stats WHERE manufacturer_id = OLD.id;'),
+    }
+    for name, (event, body) in triggers.items():
+        # Replace triggers left by older versions of this script, which recounted on every change
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'CREATE TRIGGER {name} {event} BEGIN {body} END')
+    
+    # Seed (or reseed) from the base tables
+    cursor.execute('DELETE FROM category_manufacturer_counts')
+    cursor.execute('''
+        INSERT INTO category_manufacturer_counts (category, manufacturer_id, product_count)
+        SELECT category, IFNULL(manufacturer_id, 0), COUNT(*)
+        FROM products
+        GROUP BY category, IFNULL(manufacturer_id, 0)
+    ''')
+    cursor.execute('DELETE FROM category_stats')
+    cursor.execute('''
+        INSERT INTO category_stats (category, product_count, manufacturer_count)
+        SELECT category, COUNT(*), COUNT(DISTINCT manufacturer_id)
         FROM products
         GROUP BY category
-        ORDER BY product_count DESC
     ''')
-    
-    # View for manufacturer statistics
+    cursor.execute('DELETE FROM manufacturer_stats')
+    # Aggregate products per manufacturer first, so the join sees one row per manufacturer
     cursor.execute('''
-        CREATE VIEW manufacturer_stats AS
-        SELECT 
-            m.name as manufacturer_name,
-            m.description,
-            COUNT(p.id) as product_count,
-            COUNT(DISTINCT p.category) as category_count
+        INSERT INTO manufacturer_stats (manufacturer_id, manufacturer_name, description, product_count, category_count)
+        SELECT m.id, m.name, m.description,
+               COALESCE(a.product_count, 0),
+               COALESCE(a.category_count, 0)
         FROM manufacturers m
-        LEFT JOIN products p ON m.id = p.manufacturer_id
-        GROUP BY m.id, m.name, m.description
-        ORDER BY product_count DESC
+        LEFT JOIN (SELECT manufacturer_id, COUNT(*) AS product_count,
+                          COUNT(DISTINCT category) AS category_count
+                   FROM products GROUP BY manufacturer_id) a
+        ON a.manufacturer_id = m.id
     ''')
     
-    conn.commit()
-    print("Database views created successfully!")
+    cursor.execute("COMMIT")
+    print("Roll-up tables created successfully!")
+
+def create_search_index(conn, cursor):
+    """
+    Create the FTS5 full-text index over the materialized product listing.
+    Safe to run again on an existing database.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    
+    # External-content index: the text lives in products_with_manufacturers_mat, only tokens are stored here
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+            name, description, category, manufacturer_name,
+            content='products_with_manufacturers_mat', content_rowid='id'
+        )
+    ''')
+    
+    old_values = "('delete', OLD.id, OLD.name, OLD.description, OLD.category, OLD.manufacturer_name)"
+    new_values = "(NEW.id, NEW.name, NEW.description, NEW.category, NEW.manufacturer_name)"
+    columns = 'catalog_fts, rowid, name, description, category, manufacturer_name'
+    triggers = {
+        'catalog_fts_ai': ('AFTER INSERT', f'INSERT INTO catalog_fts(rowid, name, description, category, manufacturer_name) VALUES {new_values};'),
+        'catalog_fts_ad': ('AFTER DELETE', f'INSERT INTO catalog_fts({columns}) VALUES {old_values};'),
+        'catalog_fts_au': ('AFTER UPDATE', f'INSERT INTO catalog_fts({columns}) VALUES {old_values};'
+                                           f'INSERT INTO catalog_fts(rowid, name, description, category, manufacturer_name) VALUES {new_values};'),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} ON products_with_manufacturers_mat BEGIN {body} END')
+    
+    cursor.execute("INSERT INTO catalog_fts(catalog_fts) VALUES ('rebuild')")
+    
+    cursor.execute("COMMIT")
+    print("Search index created successfully!")
 
 def main():
     """
@@ -190,27 +456,41 @@ def main():
     # Populate with data
     populate_database(conn, cursor)
     
+    # Reject a second product with the same name from the same manufacturer
+    create_product_key(conn, cursor)
+    
     # Create views
     create_views(conn, cursor)
     
+    # Materialize the product listing join and index it for search
+    create_materialized_tables(conn, cursor)
+    create_search_index(conn, cursor)
+    
+    # Precompute the category and manufacturer statistics
+    create_rollup_tables(conn, cursor)
+    
+    # Register new product categories in the categories table
+    create_category_triggers(conn, cursor)
+    
+    # Collect sqlite_stat1 statistics for the query planner now that every table and index exists
+    cursor.execute("ANALYZE")
+    
     # Display some statistics
     print("\nDatabase Statistics:")
     print("-" * 30)
     
-    cursor.execute("SELECT COUNT(*) FROM manufacturers")
-    manufacturer_count = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT (SELECT COUNT(*) FROM manufacturers),
+               (SELECT COUNT(*) FROM products),
+               (SELECT COUNT(*) FROM categories)
+    """)
+    manufacturer_count, product_count, category_count = cursor.fetchone()
     print(f"Manufacturers: {manufacturer_count}")
-    
-    cursor.execute("SELECT COUNT(*) FROM products")
-    product_count = cursor.fetchone()[0]
     print(f"Products: {product_count}")
-    
-    cursor.execute("SELECT COUNT(*) FROM categories")
-    category_count = cursor.fetchone()[0]
     print(f"Categories: {category_count}")
     
     print("\nCategory breakdown:")
-    cursor.execute("SELECT * FROM category_stats")
+    cursor.execute("SELECT * FROM category_stats ORDER BY product_count DESC, category")
     for row in cursor.fetchall():
         print(f"  {row[0]}: {row[1]} products, {row[2]} manufacturers")
     
@@ -5,8 +5,115 @@ Demonstrates various ways to query and interact with the SQLite database.
 """
 
 import sqlite3
+import functools
 import json
+import pathlib
+import queue
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from itertools import chain
+
+from create_database import (
+    configure_connection, create_category_triggers, create_materialized_tables, create_rollup_tables,
+    create_search_index
+)
+
+try:
+    import orjson
+except ImportError:  # JSON export falls back to the standard library
+    orjson = None
+
+class ConnectionPool:
+    """
+    One read-write connection, shared under a lock, plus a queue of read-only connections.
+    Under WAL the readers never block on the writer or on each other.
+    """
+    
+    def __init__(self, db_path, readers=4):
+        self.db_path = db_path
+        self.write_lock = threading.Lock()
+        self.writer = self._open('rwc')
+        self._ensure_derived_tables()
+        self.readers = queue.Queue()
+        # Every connection to ':memory:' is a separate database, so there reads go through the writer
+        if db_path != ':memory:':
+            for _ in range(readers):
+                self.readers.put(self._open('ro'))
+    
+    def _open(self, mode):
+        """Open a connection and apply the PRAGMAs, once for its whole lifetime."""
+        if self.db_path == ':memory:':
+            conn = sqlite3.connect(':memory:', check_same_thread=False)
+        else:
+            uri = pathlib.Path(self.db_path).resolve().as_uri() + f'?mode={mode}'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        configure_connection(conn, self.db_path)
+        # Plain tuples: rows are turned into dicts by KhmerProductsDB._iter, which
+        # resolves column names once per query instead of sqlite3.Row's per-access scan
+        return conn
+    
+    def _ensure_derived_tables(self):
+        """Build the trigger-maintained tables the read methods use, if the database predates them."""
+        present = {name for (name,) in self.writer.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if 'products' not in present or present.issuperset(_DERIVED_TABLES):
+            return
+        print(f"Adding derived tables to {self.db_path} (as update_database_schema.py does)...")
+        cursor = self.writer.cursor()
+        for create in (create_materialized_tables, create_search_index, create_rollup_tables, create_category_triggers):
+            create(self.writer, cursor)
+    
+    def acquire_reader(self, timeout=30):
+        """Borrow a read-only connection."""
+        if self.db_path == ':memory:':
+            return self.writer
+        try:
+            return self.readers.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(f"No read connection to {self.db_path} became free within {timeout}s")
+    
+    def release_reader(self, conn):
+        """Return a connection taken with acquire_reader()."""
+        if conn is not self.writer:
+            self.readers.put(conn)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Tables created by create_database.py's create_* helpers; category_stats is still a view in old databases
+_DERIVED_TABLES = frozenset({
+    'products_with_manufacturers_mat', 'catalog_fts', 'category_stats', 'manufacturer_stats',
+    'category_manufacturer_counts'
+})
+
+# Columns update_product() may set; manufacturer_name is translated to manufacturer_id first
+_UPDATABLE_PRODUCT_COLUMNS = frozenset({'name', 'category', 'description', 'manufacturer_id', 'image_path'})
+
+# Rows per multi-row INSERT; 500 rows of 5 columns stays well under SQLite's bound-variable limit
+_INSERT_CHUNK = 500
+
+@functools.lru_cache(maxsize=8)
+def _build_insert_sql(table, columns, row_count):
+    """Build one INSERT statement with a VALUES tuple for each of row_count rows."""
+    values = "(" + ", ".join("?" * len(columns)) + ")"
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES " + ", ".join([values] * row_count)
+
+@functools.lru_cache(maxsize=32)
+def _build_update_sql(columns):
+    """Build the UPDATE statement for a sorted tuple of column names, once per distinct set."""
+    set_clause = ", ".join(f"{column} = ?" for column in columns)
+    return f"""
+        UPDATE products 
+        SET {set_clause}, updated_at = CURRENT_TIMESTAMP 
+        WHERE id = ?
+    """
+
+def get_pool(db_path):
+    """Return the process-wide pool for db_path, creating it on first use."""
+    with _pools_lock:
+        if db_path not in _pools:
+            _pools[db_path] = ConnectionPool(db_path)
+        return _pools[db_path]
 
 class KhmerProductsDB:
     """
@@ -15,18 +122,29 @@ class KhmerProductsDB:
     
     def __init__(self, db_path='khmer_products.db'):
         self.db_path = db_path
-        self.conn = None
+        self.pool = None
+        self.conn = None  # read connection borrowed from the pool
+        self._mfr_cache = None  # manufacturer name -> id, loaded on first use
     
     def connect(self):
-        """Connect to the database."""
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row  # Enable column access by name
+        """Borrow a read connection from the database's pool."""
+        self.pool = get_pool(self.db_path)
+        self.conn = self.pool.acquire_reader()
+        self._mfr_cache = None
         return self.conn
     
     def close(self):
-        """Close the database connection."""
+        """Return the read connection to the pool."""
         if self.conn:
-            self.conn.close()
+            self.pool.release_reader(self.conn)
+            self.conn = None
+    
+    @contextmanager
+    def _write(self):
+        """Hold the pool's single writer for one transaction, committed on success."""
+        with self.pool.write_lock:
+            with self.pool.writer:
+                yield self.pool.writer
     
     def __enter__(self):
         """Context manager entry."""
@@ -38,297 +156,377 @@ class KhmerProductsDB:
         self.close()
     
     # ==================== READ OPERATIONS ====================
+    # The get_all_*, get_products_by_* and search_* methods return generators that
+    # yield one dict per row; consume them before close() or wrap them in list().
+    
+    def _iter(self, cursor):
+        """Yield each remaining row of cursor as a dict, resolving the column names once."""
+        keys = [column[0] for column in cursor.description]
+        for row in cursor:
+            yield dict(zip(keys, row))
     
     def get_all_manufacturers(self):
         """Get all manufacturers."""
         cursor = self.conn.cursor()
         cursor.execute("SELECT * FROM manufacturers ORDER BY name")
-        return [dict(row) for row in cursor.fetchall()]
+        return self._iter(cursor)
     
     def get_all_products(self):
         """Get all products with manufacturer details."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM products_with_manufacturers ORDER BY name")
-        return [dict(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM products_with_manufacturers_mat ORDER BY name")
+        return self._iter(cursor)
     
     def get_products_by_category(self, category):
         """Get all products in a specific category."""
         cursor = self.conn.cursor()
         cursor.execute("""
-            SELECT * FROM products_with_manufacturers 
+            SELECT * FROM products_with_manufacturers_mat 
             WHERE category = ? 
             ORDER BY name
         """, (category,))
-        return [dict(row) for row in cursor.fetchall()]
+        return self._iter(cursor)
     
     def get_products_by_manufacturer(self, manufacturer_name):
         """Get all products from a specific manufacturer."""
         cursor = self.conn.cursor()
         cursor.execute("""
-            SELECT * FROM products_with_manufacturers 
+            SELECT * FROM products_with_manufacturers_mat 
             WHERE manufacturer_name = ? 
             ORDER BY name
         """, (manufacturer_name,))
-        return [dict(row) for row in cursor.fetchall()]
+        return self._iter(cursor)
     
     def search_products(self, search_term):
-        """Search products by name, description, or category."""
+        """Search products by name, description, category, or manufacturer name."""
+        # Quote every word so FTS5 syntax in the input is matched literally; each word matches as a prefix
+        match = " ".join('"' + word.replace('"', '""') + '"*' for word in search_term.split())
+        if not match:
+            return self.get_all_products()
+        
         cursor = self.conn.cursor()
-        search_pattern = f"%{search_term}%"
+        
+        # A term naming a category or manufacturer exactly is answered with indexed equality lookups
         cursor.execute("""
-            SELECT * FROM products_with_manufacturers 
-            WHERE name LIKE ? 
-               OR description LIKE ? 
-               OR category LIKE ?
-               OR manufacturer_name LIKE ?
-            ORDER BY name
-        """, (search_pattern, search_pattern, search_pattern, search_pattern))
-        return [dict(row) for row in cursor.fetchall()]
+            SELECT EXISTS (SELECT 1 FROM categories WHERE name = ?),
+                   EXISTS (SELECT 1 FROM manufacturers WHERE name = ?)
+        """, (search_term, search_term))
+        is_category, is_manufacturer = cursor.fetchone()
+        if is_category or is_manufacturer:
+            # One probe per matching column; UNION merges the two index-ordered branches
+            probes = []
+            if is_category:
+                probes.append("SELECT * FROM products_with_manufacturers_mat WHERE category = :term")
+            if is_manufacturer:
+                probes.append("SELECT * FROM products_with_manufacturers_mat WHERE manufacturer_name = :term")
+            cursor.execute(" UNION ".join(probes) + " ORDER BY name", {'term': search_term})
+            return self._iter(cursor)
+        
+        cursor.execute("""
+            SELECT p.* FROM products_with_manufacturers_mat p
+            JOIN catalog_fts f ON f.rowid = p.id
+            WHERE catalog_fts MATCH ?
+            ORDER BY f.rank, p.name
+        """, (match,))
+        return self._iter(cursor)
     
     def get_category_stats(self):
         """Get statistics for each category."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM category_stats")
-        return [dict(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM category_stats ORDER BY product_count DESC, category")
+        return list(self._iter(cursor))
     
     def get_manufacturer_stats(self):
         """Get statistics for each manufacturer."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT * FROM manufacturer_stats")
-        return [dict(row) for row in cursor.fetchall()]
+        cursor.execute("SELECT * FROM manufacturer_stats ORDER BY product_count DESC, manufacturer_name")
+        return list(self._iter(cursor))
     
     def get_all_categories(self):
         """Get all categories."""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT DISTINCT category FROM products ORDER BY category")
-        return [row[0] for row in cursor.fetchall()]
+        # The categories table is kept complete by triggers on products (see create_category_triggers)
+        cursor.execute("SELECT name FROM categories ORDER BY name")
+        return (row[0] for row in cursor)
+    
+    def _get_mfr_id(self, name):
+        """Look up a manufacturer id by name, or None if there is no such manufacturer."""
+        if self._mfr_cache is None or name not in self._mfr_cache:
+            # Load on first use and reload on a miss, in case another connection added it
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT name, id FROM manufacturers")
+            self._mfr_cache = dict(cursor.fetchall())
+        return self._mfr_cache.get(name)
     
     # ==================== WRITE OPERATIONS ====================
     
+    def _insert_many(self, table, columns, params):
+        """Insert every parameter tuple in a single transaction and return the new ids."""
+        with self._write() as conn:
+            # A multi-row INSERT is parsed and bound once per chunk rather than stepped once per row
+            for start in range(0, len(params), _INSERT_CHUNK):
+                chunk = params[start:start + _INSERT_CHUNK]
+                conn.execute(_build_insert_sql(table, columns, len(chunk)), list(chain.from_iterable(chunk)))
+            # Rows inserted in one transaction receive consecutive ids
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return list(range(last_id - len(params) + 1, last_id + 1))
+    
+    def add_manufacturers_bulk(self, rows):
+        """Add many manufacturers at once from dicts with name, description and logo_path keys."""
+        params = [(row['name'], row.get('description'), row.get('logo_path')) for row in rows]
+        if not params:
+            return []
+        try:
+            return self._insert_many('manufacturers', ('name', 'description', 'logo_path'), params)
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Manufacturer already exists: {e}")
+        finally:
+            self._mfr_cache = None
+    
     def add_manufacturer(self, name, description=None, logo_path=None):
         """Add a new manufacturer."""
-        cursor = self.conn.cursor()
         try:
-            cursor.execute("""
-                INSERT INTO manufacturers (name, description, logo_path) 
-                VALUES (?, ?, ?)
-            """, (name, description, logo_path))
-            self.conn.commit()
-            return cursor.lastrowid
-        except sqlite3.IntegrityError:
+            return self.add_manufacturers_bulk([
+                {'name': name, 'description': description, 'logo_path': logo_path}
+            ])[0]
+        except ValueError:
             raise ValueError(f"Manufacturer '{name}' already exists")
     
+    def add_products_bulk(self, rows):
+        """Add many products at once from dicts with the same keys as add_product's arguments."""
+        params = []
+        for row in rows:
+            manufacturer_id = None
+            manufacturer_name = row.get('manufacturer_name')
+            if manufacturer_name:
+                manufacturer_id = self._get_mfr_id(manufacturer_name)
+                if manufacturer_id is None:
+                    raise ValueError(f"Manufacturer '{manufacturer_name}' not found")
+            params.append((row['name'], row['category'], row.get('description'), manufacturer_id, row.get('image_path')))
+        if not params:
+            return []
+        
+        return self._insert_many(
+            'products', ('name', 'category', 'description', 'manufacturer_id', 'image_path'), params
+        )
+    
     def add_product(self, name, category, description=None, manufacturer_name=None, image_path=None):
         """Add a new product."""
-        cursor = self.conn.cursor()
-        
-        # Get manufacturer ID if manufacturer_name is provided
-        manufacturer_id = None
-        if manufacturer_name:
-            cursor.execute("SELECT id FROM manufacturers WHERE name = ?", (manufacturer_name,))
-            result = cursor.fetchone()
-            if result:
-                manufacturer_id = result[0]
-            else:
-                raise ValueError(f"Manufacturer '{manufacturer_name}' not found")
-        
-        cursor.execute("""
-            INSERT INTO products (name, category, description, manufacturer_id, image_path) 
-            VALUES (?, ?, ?, ?, ?)
-        """, (name, category, description, manufacturer_id, image_path))
-        self.conn.commit()
-        return cursor.lastrowid
+        return self.add_products_bulk([{
+            'name': name,
+            'category': category,
+            'description': description,
+            'manufacturer_name': manufacturer_name,
+            'image_path': image_path
+        }])[0]
     
     def update_product(self, product_id, **kwargs):
         """Update a product with the given fields."""
-        cursor = self.conn.cursor()
-        
         # Handle manufacturer_name to manufacturer_id conversion
         if 'manufacturer_name' in kwargs:
             manufacturer_name = kwargs.pop('manufacturer_name')
-            cursor.execute("SELECT id FROM manufacturers WHERE name = ?", (manufacturer_name,))
-            result = cursor.fetchone()
-            if result:
-                kwargs['manufacturer_id'] = result[0]
+            manufacturer_id = self._get_mfr_id(manufacturer_name)
+            if manufacturer_id is not None:
+                kwargs['manufacturer_id'] = manufacturer_id
             else:
                 raise ValueError(f"Manufacturer '{manufacturer_name}' not found")
         
-        # Build dynamic update query
+        # Build the update query from known columns only
         if not kwargs:
             return
         
-        set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-        values = list(kwargs.values()) + [product_id]
+        unknown = kwargs.keys() - _UPDATABLE_PRODUCT_COLUMNS
+        if unknown:
+            raise ValueError(f"Cannot update product field(s): {', '.join(sorted(unknown))}")
+        
+        columns = tuple(sorted(kwargs))
+        values = [kwargs[column] for column in columns] + [product_id]
         
-        cursor.execute(f"""
-            UPDATE products 
-            SET {set_clause}, updated_at = CURRENT_TIMESTAMP 
-            WHERE id = ?
-        """, values)
-        self.conn.commit()
+        with self._write() as conn:
+            cursor = conn.execute(_build_update_sql(columns), values)
         return cursor.rowcount > 0
     
     def delete_product(self, product_id):
         """Delete a product."""
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-        self.conn.commit()
+        with self._write() as conn:
+            cursor = conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
         return cursor.rowcount > 0
     
     def delete_manufacturer(self, manufacturer_id):
         """Delete a manufacturer (will fail if products exist)."""
-        cursor = self.conn.cursor()
         try:
-            cursor.execute("DELETE FROM manufacturers WHERE id = ?", (manufacturer_id,))
-            self.conn.commit()
+            with self._write() as conn:
+                cursor = conn.execute("DELETE FROM manufacturers WHERE id = ?", (manufacturer_id,))
             return cursor.rowcount > 0
         except sqlite3.IntegrityError:
             raise ValueError("Cannot delete manufacturer with existing products")
+        finally:
+            self._mfr_cache = None
+    
+    def delete_category(self, name):
+        """Delete a category, unless products still use it."""
+        with self._write() as conn:
+            cursor = conn.execute('''
+                DELETE FROM categories
+                WHERE name = ? AND NOT EXISTS (SELECT 1 FROM products WHERE category = categories.name)
+            ''', (name,))
+        return cursor.rowcount > 0
     
     # ==================== UTILITY METHODS ====================
     
-    def export_to_json(self, filename='khmer_products_export.json'):
-        """Export all data to JSON format."""
+    def export_to_json(self, filename='khmer_products_export.json', compact=False):
+        """Export all data to JSON format; compact=True drops the indentation for smaller backups."""
         data = {
-            'manufacturers': self.get_all_manufacturers(),
-            'products': self.get_all_products(),
-            'categories': self.get_all_categories(),
+            'manufacturers': list(self.get_all_manufacturers()),
+            'products': list(self.get_all_products()),
+            'categories': list(self.get_all_categories()),
             'export_date': datetime.now().isoformat()
         }
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        if orjson:
+            option = orjson.OPT_NON_STR_KEYS if compact else orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+            with open(filename, 'wb') as f:
+                f.write(orjson.dumps(data, option=option))
+        else:
+            with open(filename, 'w', encoding='utf-8') as f:
+                if compact:
+                    json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+                else:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
         
         return filename
 
-def demonstrate_queries():
+def demonstrate_queries(db):
     """
     Demonstrate various database queries.
     """
     print("Khmer Products Database Examples")
     print("=" * 50)
     
-    with KhmerProductsDB() as db:
-        # 1. Get all manufacturers
-        print("\n1. All Manufacturers:")
-        manufacturers = db.get_all_manufacturers()
-        for manufacturer in manufacturers:
-            print(f"   - {manufacturer['name']}: {manufacturer['description']}")
-        
-        # 2. Get products by category
-        print("\n2. Products in 'Condiments & Sauces' category:")
-        condiments = db.get_products_by_category('Condiments & Sauces')
-        for product in condiments:
-            print(f"   - {product['name']} by {product['manufacturer_name']}")
-        
-        # 3. Get products by manufacturer
-        print("\n3. Products by CamboChef:")
-        cambochef_products = db.get_products_by_manufacturer('CamboChef')
-        for product in cambochef_products:
-            print(f"   - {product['name']} ({product['category']})")
-        
-        # 4. Search products
-        print("\n4. Search results for 'milk':")
-        milk_products = db.search_products('milk')
-        for product in milk_products:
-            print(f"   - {product['name']} by {product['manufacturer_name']}")
-        
-        # 5. Category statistics
-        print("\n5. Category Statistics:")
-        stats = db.get_category_stats()
-        for stat in stats:
-            print(f"   - {stat['category']}: {stat['product_count']} products, {stat['manufacturer_count']} manufacturers")
-        
-        # 6. Manufacturer statistics
-        print("\n6. Manufacturer Statistics:")
-        manufacturer_stats = db.get_manufacturer_stats()
-        for stat in manufacturer_stats:
-            print(f"   - {stat['manufacturer_name']}: {stat['product_count']} products in {stat['category_count']} categories")
+    # 1. Get all manufacturers
+    print("\n1. All Manufacturers:")
+    manufacturers = db.get_all_manufacturers()
+    for manufacturer in manufacturers:
+        print(f"   - {manufacturer['name']}: {manufacturer['description']}")
+    
+    # 2. Get products by category
+    print("\n2. Products in 'Condiments & Sauces' category:")
+    condiments = db.get_products_by_category('Condiments & Sauces')
+    for product in condiments:
+        print(f"   - {product['name']} by {product['manufacturer_name']}")
+    
+    # 3. Get products by manufacturer
+    print("\n3. Products by CamboChef:")
+    cambochef_products = db.get_products_by_manufacturer('CamboChef')
+    for product in cambochef_products:
+        print(f"   - {product['name']} ({product['category']})")
+    
+    # 4. Search products
+    print("\n4. Search results for 'milk':")
+    milk_products = db.search_products('milk')
+    for product in milk_products:
+        print(f"   - {product['name']} by {product['manufacturer_name']}")
+    
+    # 5. Category statistics
+    print("\n5. Category Statistics:")
+    stats = db.get_category_stats()
+    for stat in stats:
+        print(f"   - {stat['category']}: {stat['product_count']} products, {stat['manufacturer_count']} manufacturers")
+    
+    # 6. Manufacturer statistics
+    print("\n6. Manufacturer Statistics:")
+    manufacturer_stats = db.get_manufacturer_stats()
+    for stat in manufacturer_stats:
+        print(f"   - {stat['manufacturer_name']}: {stat['product_count']} products in {stat['category_count']} categories")
 
-def demonstrate_crud_operations():
+def demonstrate_crud_operations(db):
     """
     Demonstrate Create, Read, Update, Delete operations.
     """
     print("\nCRUD Operations Demo")
     print("=" * 30)
     
-    with KhmerProductsDB() as db:
-        # CREATE: Add a new manufacturer
-        print("\n1. Adding new manufacturer 'Test Company'...")
-        try:
-            manufacturer_id = db.add_manufacturer(
-                name="Test Company",
-                description="A test company for demonstration",
-                logo_path="test/logo.png"
-            )
-            print(f"   Added manufacturer with ID: {manufacturer_id}")
-        except ValueError as e:
-            print(f"   Error: {e}")
-        
-        # CREATE: Add a new product
-        print("\n2. Adding new product 'Test Product'...")
+    # CREATE: Add a new manufacturer
+    print("\n1. Adding new manufacturer 'Test Company'...")
+    try:
+        manufacturer_id = db.add_manufacturer(
+            name="Test Company",
+            description="A test company for demonstration",
+            logo_path="test/logo.png"
+        )
+        print(f"   Added manufacturer with ID: {manufacturer_id}")
+    except ValueError as e:
+        print(f"   Error: {e}")
+    
+    # The product's categories are added by trigger; note which ones are new so cleanup can remove them
+    existing_categories = set(db.get_all_categories())
+    
+    # CREATE: Add a new product
+    print("\n2. Adding new product 'Test Product'...")
+    try:
+        product_id = db.add_product(
+            name="Test Product",
+            category="Electronics",
+            description="A test product",
+            manufacturer_name="Test Company",
+            image_path="test/product.jpg"
+        )
+        print(f"   Added product with ID: {product_id}")
+    except ValueError as e:
+        print(f"   Error: {e}")
+    
+    # READ: Get the new product
+    print("\n3. Reading the new product...")
+    product = next(db.search_products('Test Product'), None)
+    if product:
+        print(f"   Found: {product['name']} by {product['manufacturer_name']}")
+    
+    # UPDATE: Update the product
+    print("\n4. Updating the product description...")
+    if 'product_id' in locals():
+        success = db.update_product(
+            product_id,
+            description="Updated test product description",
+            category="Computers"
+        )
+        print(f"   Update {'successful' if success else 'failed'}")
+    
+    # DELETE: Remove the test data
+    print("\n5. Cleaning up test data...")
+    if 'product_id' in locals():
+        db.delete_product(product_id)
+        print("   Deleted test product")
+    
+    if 'manufacturer_id' in locals():
         try:
-            product_id = db.add_product(
-                name="Test Product",
-                category="Electronics",
-                description="A test product",
-                manufacturer_name="Test Company",
-                image_path="test/product.jpg"
-            )
-            print(f"   Added product with ID: {product_id}")
+            db.delete_manufacturer(manufacturer_id)
+            print("   Deleted test manufacturer")
         except ValueError as e:
-            print(f"   Error: {e}")
-        
-        # READ: Get the new product
-        print("\n3. Reading the new product...")
-        test_products = db.search_products('Test Product')
-        if test_products:
-            product = test_products[0]
-            print(f"   Found: {product['name']} by {product['manufacturer_name']}")
-        
-        # UPDATE: Update the product
-        print("\n4. Updating the product description...")
-        if 'product_id' in locals():
-            success = db.update_product(
-                product_id,
-                description="Updated test product description",
-                category="Computers"
-            )
-            print(f"   Update {'successful' if success else 'failed'}")
-        
-        # DELETE: Remove the test data
-        print("\n5. Cleaning up test data...")
-        if 'product_id' in locals():
-            db.delete_product(product_id)
-            print("   Deleted test product")
-        
-        if 'manufacturer_id' in locals():
-            try:
-                db.delete_manufacturer(manufacturer_id)
-                print("   Deleted test manufacturer")
-            except ValueError as e:
-                print(f"   Error deleting manufacturer: {e}")
+            print(f"   Error deleting manufacturer: {e}")
+    
+    for category in ("Electronics", "Computers"):
+        if category not in existing_categories and db.delete_category(category):
+            print(f"   Deleted test category '{category}'")
 
-def export_data_example():
+def export_data_example(db):
     """
     Demonstrate data export functionality.
     """
     print("\nData Export Example")
     print("=" * 25)
     
-    with KhmerProductsDB() as db:
-        filename = db.export_to_json('khmer_products_backup.json')
-        print(f"Data exported to: {filename}")
-        
-        # Show a sample of the exported data
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        print(f"\nExported data contains:")
-        print(f"   - {len(data['manufacturers'])} manufacturers")
-        print(f"   - {len(data['products'])} products")
-        print(f"   - {len(data['categories'])} categories")
-        print(f"   - Export date: {data['export_date']}")
+    filename = db.export_to_json('khmer_products_backup.json')
+    print(f"Data exported to: {filename}")
+    
+    # Show a sample of the exported data
+    with open(filename, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    print(f"\nExported data contains:")
+    print(f"   - {len(data['manufacturers'])} manufacturers")
+    print(f"   - {len(data['products'])} products")
+    print(f"   - {len(data['categories'])} categories")
+    print(f"   - Export date: {data['export_date']}")
 
 def main():
     """
@@ -341,10 +539,15 @@ def main():
             print("Database not found. Please run 'python create_database.py' first.")
             return
         
-        # Run demonstrations
-        demonstrate_queries()
-        demonstrate_crud_operations()
-        export_data_example()
+        # Run demonstrations, sharing one connection
+        db = KhmerProductsDB()
+        db.connect()
+        try:
+            demonstrate_queries(db)
+            demonstrate_crud_operations(db)
+            export_data_example(db)
+        finally:
+            db.close()
         
         print("\n" + "=" * 50)
         print("All examples completed successfully!")
@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
-import pandas as pd
+from itertools import islice
+from openpyxl import load_workbook
 import sys
 
 try:
-    xls = pd.ExcelFile('Manufacturers.xlsx')
-    print('Sheet names:', xls.sheet_names)
+    # read_only streams rows from the file instead of loading whole sheets into memory
+    wb = load_workbook('Manufacturers.xlsx', read_only=True, data_only=True)
+    print('Sheet names:', wb.sheetnames)
     
-    for sheet in xls.sheet_names:
-        df = pd.read_excel('Manufacturers.xlsx', sheet_name=sheet)
+    for sheet in wb.sheetnames:
+        ws = wb[sheet]
+        rows = ws.iter_rows(values_only=True)
+        columns = list(next(rows, ()))
         print(f'\n{sheet} sheet:')
-        print(df.head())
-        print(f'Shape: {df.shape}')
-        print(f'Columns: {list(df.columns)}')
+        for row in islice(rows, 5):
+            print(row)
+        print(f'Shape: ({(ws.max_row or 1) - 1}, {ws.max_column or len(columns)})')
+        print(f'Columns: {columns}')
+    wb.close()
 except Exception as e:
     print(f'Error: {e}')
\ No newline at end of file
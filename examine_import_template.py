@@ -1,14 +1,19 @@
-import pandas as pd
+from itertools import islice
+from openpyxl import load_workbook
 
-# Load the Excel file
-xl = pd.ExcelFile('ImportTemplate.xlsx')
-print('Sheets:', xl.sheet_names)
+# Load the Excel file; read_only streams rows instead of parsing whole sheets up front
+wb = load_workbook('ImportTemplate.xlsx', read_only=True, data_only=True)
+print('Sheets:', wb.sheetnames)
 
-# Examine each sheet
-for sheet in xl.sheet_names:
-    df = pd.read_excel('ImportTemplate.xlsx', sheet_name=sheet)
+# Examine each sheet: header row for the columns, then a five-row preview
+for sheet in wb.sheetnames:
+    ws = wb[sheet]
+    rows = ws.iter_rows(values_only=True)
+    columns = list(next(rows, ()))
     print(f'\n{sheet} sheet:')
-    print(f'Shape: {df.shape}')
-    print(f'Columns: {list(df.columns)}')
-    print(df.head())
-    print('-' * 50)
\ No newline at end of file
+    print(f'Shape: ({(ws.max_row or 1) - 1}, {ws.max_column or len(columns)})')
+    print(f'Columns: {columns}')
+    for row in islice(rows, 5):
+        print(row)
+    print('-' * 50)
+wb.close()
\ No newline at end of file
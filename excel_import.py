@@ -4,16 +4,178 @@ Excel Import Script for Khmer Products Database
 Imports manufacturers and products from Excel files into the SQLite database.
 """
 
-import pandas as pd
+import csv
 import sqlite3
 import os
+import tempfile
 from datetime import datetime
+from itertools import islice
+
+from openpyxl import Workbook, load_workbook
+
+from create_database import configure_connection
+
+try:
+    # Rust-based reader, several times faster than openpyxl for reading
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    # Fastest xlsx writer; its constant_memory mode flushes each row as it is written
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Rows handed to each executemany call, so memory stays flat however long the sheet is
+BATCH = 10000
+
+# Skipped rows listed individually after an import; the rest are only counted
+DIAGNOSTIC_LIMIT = 20
+
+SQL_CREATE_CATEGORIES = """
+    CREATE TABLE IF NOT EXISTS categories (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Insert statements shared by every batch, so each is prepared once per connection.
+# OR IGNORE skips rows that hit a unique index; COALESCE stores empty cells as ''.
+SQL_INSERT_MANUFACTURER = """
+    INSERT OR IGNORE INTO manufacturers 
+    (name, description, logo_path, business_name, business_address, business_contact, business_social_network)
+    VALUES (COALESCE(?, ''), COALESCE(?, ''), COALESCE(?, ''), COALESCE(?, ''),
+            COALESCE(?, ''), COALESCE(?, ''), COALESCE(?, ''))
+"""
+
+SQL_INSERT_CATEGORY = """
+    INSERT OR IGNORE INTO categories (name)
+    VALUES (COALESCE(?, ''))
+"""
+
+SQL_INSERT_PRODUCT = """
+    INSERT OR IGNORE INTO products 
+    (name, category, description, manufacturer_id, image_path)
+    VALUES (COALESCE(?, ''), COALESCE(?, ''), COALESCE(?, ''), ?, COALESCE(?, ''))
+"""
+
+def _connect(db_path):
+    """
+    Open a connection tuned for bulk inserts.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    configure_connection(conn, db_path)
+    # Refuse a product whose manufacturer_id names no manufacturer, as api_server does
+    conn.execute("PRAGMA foreign_keys=ON")
+    # A larger page cache keeps index pages resident while a whole sheet is inserted
+    conn.execute("PRAGMA cache_size=-65536")
+    return conn
+
+def _ensure_product_key(conn):
+    """
+    Make sure the database rejects duplicate products itself.
+    
+    OR IGNORE only skips products already present through the
+    ux_products_name_mfr unique index. If it is missing and products has no
+    duplicates the index is created here; otherwise update_database_schema.py
+    has to remove the duplicates first.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ux_products_name_mfr'").fetchone():
+        return
+    if conn.execute("SELECT 1 FROM products GROUP BY name, manufacturer_id HAVING COUNT(*) > 1 LIMIT 1").fetchone():
+        raise RuntimeError("products has duplicate (name, manufacturer) rows; run update_database_schema.py first")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_products_name_mfr ON products(name, manufacturer_id)")
+
+def _open_workbook(excel_file):
+    """
+    Open an Excel file for reading with python-calamine if it is installed, else openpyxl.
+    """
+    if CalamineWorkbook is not None:
+        return CalamineWorkbook.from_path(excel_file)
+    return load_workbook(excel_file, read_only=True, data_only=True)
+
+def _calamine_row(row):
+    """
+    Convert a calamine row to a tuple, turning whole-number floats back into ints.
+    """
+    # calamine reports every number as a float; openpyxl keeps integers as int
+    if float in map(type, row):
+        return tuple(int(value) if type(value) is float and value.is_integer() else value for value in row)
+    return tuple(row)
+
+def _sheet_rows(excel_file, sheet_name, columns):
+    """
+    Yield the data rows of a worksheet as tuples ordered like columns.
+    
+    excel_file is either a path or a workbook returned by _open_workbook;
+    pass the workbook when reading several sheets so the file is only
+    parsed once. Columns missing from the header row come back as ''; empty
+    cells are None from openpyxl and '' from calamine, so the INSERT
+    statements COALESCE NULLs to ''. The first column is the required name,
+    and rows where it is blank (including wholly empty rows, which Excel
+    often leaves after the data) are skipped.
+    """
+    opened = isinstance(excel_file, (str, os.PathLike))
+    workbook = _open_workbook(excel_file) if opened else excel_file
+    try:
+        if isinstance(workbook, Workbook):
+            sheet = workbook[sheet_name]
+            header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+            # max_col pads short rows with None, so every row has the header's width
+            rows = sheet.iter_rows(min_row=2, max_col=len(header) or 1, values_only=True)
+        else:
+            if sheet_name not in workbook.sheet_names:
+                raise KeyError(f"Worksheet {sheet_name} does not exist.")
+            # calamine pads every row to the sheet's width with ''
+            rows = map(_calamine_row, workbook.get_sheet_by_name(sheet_name).iter_rows())
+            header = next(rows, ())
+        if not header:
+            return
+        index = {name: position for position, name in enumerate(header) if name not in (None, '')}
+        # Missing columns point past the end of every row and read as ''
+        width = len(header)
+        pick = [index.get(column, width) for column in columns]
+        for row in rows:
+            values = tuple(row[i] if i < len(row) else '' for i in pick)
+            name = values[0]
+            if name is None or (isinstance(name, str) and not name.strip()):
+                continue
+            yield values
+    finally:
+        if opened:
+            workbook.close()
+
+def _print_skipped(description, messages):
+    """
+    Print how many rows were skipped, followed by the first DIAGNOSTIC_LIMIT of them.
+    """
+    if messages:
+        print(f"Skipped {len(messages)} {description}; first {min(len(messages), DIAGNOSTIC_LIMIT)}:")
+        print('\n'.join(f"  {message}" for message in messages[:DIAGNOSTIC_LIMIT]))
+
+def _insert_batches(cursor, sql, rows):
+    """
+    Run sql with executemany over rows, BATCH rows at a time.
+    
+    Returns (rows read, rows inserted).
+    """
+    rows = iter(rows)
+    read_count = inserted_count = 0
+    while True:
+        batch = list(islice(rows, BATCH))
+        if not batch:
+            return read_count, inserted_count
+        cursor.executemany(sql, batch)
+        read_count += len(batch)
+        inserted_count += cursor.rowcount
 
 def import_manufacturers_from_excel(excel_file, db_path='khmer_products.db'):
     """
-    Import manufacturers from Excel file to database.
+    Import manufacturers from an Excel file (path or open workbook) to database.
     
-    Excel file should have columns:
+    The 'Manufacturers' sheet should have columns:
     - name (required)
     - description
     - logo_path
@@ -23,38 +185,23 @@ def import_manufacturers_from_excel(excel_file, db_path='khmer_products.db'):
     - business_social_network
     """
     try:
-        # Read Excel file
-        df = pd.read_excel(excel_file, sheet_name='Manufacturers')
-        
         # Connect to database
-        conn = sqlite3.connect(db_path)
+        conn = _connect(db_path)
         cursor = conn.cursor()
         
-        # Insert manufacturers
-        inserted_count = 0
-        for index, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT INTO manufacturers 
-                    (name, description, logo_path, business_name, business_address, business_contact, business_social_network)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    row.get('name', ''),
-                    row.get('description', ''),
-                    row.get('logo_path', ''),
-                    row.get('business_name', ''),
-                    row.get('business_address', ''),
-                    row.get('business_contact', ''),
-                    row.get('business_social_network', '')
-                ))
-                inserted_count += 1
-            except sqlite3.IntegrityError as e:
-                print(f"Skipping duplicate manufacturer: {row.get('name', 'Unknown')} - {e}")
-        
-        conn.commit()
+        # Insert manufacturers in batches within one transaction; OR IGNORE skips duplicate names
+        columns = ['name', 'description', 'logo_path', 'business_name',
+                   'business_address', 'business_contact', 'business_social_network']
+        with conn:
+            read_count, inserted_count = _insert_batches(
+                cursor, SQL_INSERT_MANUFACTURER, _sheet_rows(excel_file, 'Manufacturers', columns)
+            )
         conn.close()
         
-        print(f"Successfully imported {inserted_count} manufacturers from {excel_file}")
+        if read_count > inserted_count:
+            print(f"Skipped {read_count - inserted_count} duplicate manufacturers")
+        
+        print(f"Successfully imported {inserted_count} manufacturers")
         return True
         
     except Exception as e:
@@ -63,44 +210,30 @@ def import_manufacturers_from_excel(excel_file, db_path='khmer_products.db'):
 
 def import_categories_from_excel(excel_file, db_path='khmer_products.db'):
     """
-    Import categories from Excel file to database.
+    Import categories from an Excel file (path or open workbook) to database.
     
-    Excel file should have a 'Categories' sheet with column:
+    The workbook should have a 'Categories' sheet with column:
     - name (required)
     """
     try:
-        # Read Excel file
-        df = pd.read_excel(excel_file, sheet_name='Categories')
-        
         # Connect to database
-        conn = sqlite3.connect(db_path)
+        conn = _connect(db_path)
         cursor = conn.cursor()
         
         # Create categories table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS categories (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Insert categories
-        inserted_count = 0
-        for index, row in df.iterrows():
-            try:
-                cursor.execute("""
-                    INSERT INTO categories (name)
-                    VALUES (?)
-                """, (row.get('name', ''),))
-                inserted_count += 1
-            except sqlite3.IntegrityError as e:
-                print(f"Skipping duplicate category: {row.get('name', 'Unknown')} - {e}")
+        cursor.execute(SQL_CREATE_CATEGORIES)
         
-        conn.commit()
+        # Insert categories in batches within one transaction; OR IGNORE skips duplicate names
+        with conn:
+            read_count, inserted_count = _insert_batches(
+                cursor, SQL_INSERT_CATEGORY, _sheet_rows(excel_file, 'Categories', ['name'])
+            )
         conn.close()
         
-        print(f"Successfully imported {inserted_count} categories from {excel_file}")
+        if read_count > inserted_count:
+            print(f"Skipped {read_count - inserted_count} duplicate categories")
+        
+        print(f"Successfully imported {inserted_count} categories")
         return True
         
     except Exception as e:
@@ -109,9 +242,9 @@ def import_categories_from_excel(excel_file, db_path='khmer_products.db'):
 
 def import_products_from_excel(excel_file, db_path='khmer_products.db'):
     """
-    Import products from Excel file to database.
+    Import products from an Excel file (path or open workbook) to database.
     
-    Excel file should have columns:
+    The 'Products' sheet should have columns:
     - name (required)
     - category (required)
     - description
@@ -119,65 +252,167 @@ def import_products_from_excel(excel_file, db_path='khmer_products.db'):
     - image_path
     """
     try:
-        # Read Excel file
-        df = pd.read_excel(excel_file, sheet_name='Products')
-        
         # Connect to database
-        conn = sqlite3.connect(db_path)
+        conn = _connect(db_path)
         cursor = conn.cursor()
         
-        # Get manufacturer mapping
-        cursor.execute("SELECT id, name FROM manufacturers")
-        manufacturer_map = {name: id for id, name in cursor.fetchall()}
+        _ensure_product_key(conn)
         
-        # Insert products
-        inserted_count = 0
-        for index, row in df.iterrows():
-            manufacturer_name = row.get('manufacturer_name', '')
-            manufacturer_id = manufacturer_map.get(manufacturer_name)
-            product_name = row.get('name', '')
-            
-            if not manufacturer_id:
-                print(f"Skipping product '{product_name}' - manufacturer '{manufacturer_name}' not found")
-                continue
-            
-            # Check if product already exists with same name and manufacturer
-            cursor.execute("""
-                SELECT id FROM products 
-                WHERE name = ? AND manufacturer_id = ?
-            """, (product_name, manufacturer_id))
-            
-            existing_product = cursor.fetchone()
-            if existing_product:
-                print(f"Skipping duplicate product: '{product_name}' from manufacturer '{manufacturer_name}' already exists")
-                continue
-                
-            try:
-                cursor.execute("""
-                    INSERT INTO products 
-                    (name, category, description, manufacturer_id, image_path)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (
-                    product_name,
-                    row.get('category', ''),
-                    row.get('description', ''),
-                    manufacturer_id,
-                    row.get('image_path', '')
-                ))
-                inserted_count += 1
-            except Exception as e:
-                print(f"Error inserting product '{product_name}': {e}")
+        # Manufacturer ids by name, filled in only for names the sheet uses
+        # (None marks a name that has no manufacturer)
+        manufacturer_map = {}
+        
+        # Swap each manufacturer name for its id a batch at a time, looking up
+        # the names a batch introduces with one query on the unique name index.
+        # Rows with an unknown manufacturer are noted in skipped and reported
+        # once the import finishes.
+        skipped = []
+        def product_rows():
+            columns = ['name', 'category', 'description', 'manufacturer_name', 'image_path']
+            sheet_rows = _sheet_rows(excel_file, 'Products', columns)
+            while True:
+                batch = list(islice(sheet_rows, BATCH))
+                if not batch:
+                    return
+                new_names = list({row[3] for row in batch} - manufacturer_map.keys())
+                if new_names:
+                    manufacturer_map.update(dict.fromkeys(new_names))
+                    manufacturer_map.update(conn.execute(
+                        f"SELECT name, id FROM manufacturers WHERE name IN ({', '.join('?' * len(new_names))})",
+                        new_names
+                    ))
+                for product_name, category, description, manufacturer_name, image_path in batch:
+                    manufacturer_id = manufacturer_map.get(manufacturer_name)
+                    if manufacturer_id is None:
+                        skipped.append(f"'{product_name or ''}' - manufacturer '{manufacturer_name or ''}' not found")
+                        continue
+                    yield product_name, category, description, manufacturer_id, image_path
         
-        conn.commit()
+        # Insert products in batches within one transaction; OR IGNORE skips ones already present
+        with conn:
+            read_count, inserted_count = _insert_batches(cursor, SQL_INSERT_PRODUCT, product_rows())
         conn.close()
         
-        print(f"Successfully imported {inserted_count} products from {excel_file}")
+        _print_skipped('products with an unknown manufacturer', skipped)
+        if read_count > inserted_count:
+            print(f"Skipped {read_count - inserted_count} duplicate products")
+        print(f"Successfully imported {inserted_count} products")
         return True
         
     except Exception as e:
         print(f"Error importing products: {e}")
         return False
 
+def _load_csv_extension(conn):
+    """
+    Load SQLite's csv virtual table extension, returning False if it is unavailable.
+    """
+    try:
+        conn.enable_load_extension(True)
+        conn.load_extension('csv')
+    except (AttributeError, sqlite3.OperationalError):
+        # AttributeError: this Python's sqlite3 was built without extension loading
+        return False
+    conn.enable_load_extension(False)
+    return True
+
+def _sheet_to_csv(workbook, sheet_name, columns):
+    """
+    Write a worksheet's rows to a temporary CSV file under a header of columns.
+    
+    Returns the file's path and the number of rows written.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', encoding='utf-8', delete=False) as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        row_count = 0
+        for row in _sheet_rows(workbook, sheet_name, columns):
+            writer.writerow(row)
+            row_count += 1
+    return handle.name, row_count
+
+def import_from_excel_fast(excel_file, db_path='khmer_products.db'):
+    """
+    Import categories, manufacturers and products through SQLite's csv virtual table.
+    
+    Each sheet is written to a temporary CSV file and copied into its table
+    with a single INSERT ... SELECT, so rows never pass one at a time between
+    Python and SQLite. Returns None when the csv extension cannot be loaded,
+    so the caller can fall back to the regular importers; otherwise True or
+    False like they do.
+    """
+    conn = _connect(db_path)
+    try:
+        if not _load_csv_extension(conn):
+            return None
+        
+        steps = (
+            ('categories', 'Categories', ['name'], SQL_CREATE_CATEGORIES, """
+                INSERT OR IGNORE INTO categories (name)
+                SELECT name FROM temp.sheet
+            """),
+            ('manufacturers', 'Manufacturers',
+             ['name', 'description', 'logo_path', 'business_name',
+              'business_address', 'business_contact', 'business_social_network'], None, """
+                INSERT OR IGNORE INTO manufacturers 
+                (name, description, logo_path, business_name, business_address, business_contact, business_social_network)
+                SELECT name, description, logo_path, business_name, business_address, business_contact, business_social_network
+                FROM temp.sheet
+            """),
+            ('products', 'Products', ['name', 'category', 'description', 'manufacturer_name', 'image_path'],
+             None, """
+                INSERT OR IGNORE INTO products 
+                (name, category, description, manufacturer_id, image_path)
+                SELECT s.name, s.category, s.description, m.id, s.image_path
+                FROM temp.sheet s
+                JOIN manufacturers m ON m.name = s.manufacturer_name
+            """),
+        )
+        
+        workbook = _open_workbook(excel_file)
+        success = True
+        try:
+            for label, sheet_name, columns, setup_sql, copy_sql in steps:
+                csv_path = None
+                try:
+                    csv_path, read_count = _sheet_to_csv(workbook, sheet_name, columns)
+                    if setup_sql:
+                        conn.execute(setup_sql)
+                    quoted_path = csv_path.replace("'", "''")
+                    conn.execute(f"CREATE VIRTUAL TABLE temp.sheet USING csv(filename='{quoted_path}', header=YES)")
+                    
+                    if label == 'products':
+                        _ensure_product_key(conn)
+                        unknown = conn.execute("""
+                            SELECT s.name, s.manufacturer_name FROM temp.sheet s
+                            LEFT JOIN manufacturers m ON m.name = s.manufacturer_name
+                            WHERE m.id IS NULL
+                        """).fetchall()
+                        _print_skipped('products with an unknown manufacturer', [
+                            f"'{product_name}' - manufacturer '{manufacturer_name}' not found"
+                            for product_name, manufacturer_name in unknown
+                        ])
+                        read_count -= len(unknown)
+                    
+                    with conn:
+                        inserted_count = conn.execute(copy_sql).rowcount
+                    
+                    if read_count > inserted_count:
+                        print(f"Skipped {read_count - inserted_count} duplicate {label}")
+                    print(f"Successfully imported {inserted_count} {label}")
+                except Exception as e:
+                    print(f"Error importing {label}: {e}")
+                    success = False
+                finally:
+                    conn.execute("DROP TABLE IF EXISTS temp.sheet")
+                    if csv_path:
+                        os.remove(csv_path)
+        finally:
+            workbook.close()
+        return success
+    finally:
+        conn.close()
+
 def create_sample_excel_template(filename='sample_import_template.xlsx'):
     """
     Create a sample Excel template with the correct structure.
@@ -219,11 +454,26 @@ def create_sample_excel_template(filename='sample_import_template.xlsx'):
             'image_path': ['ABC/rice.jpg', 'XYZ/phone.png', 'LocalBrand/sauce.jpg', 'LocalBrand/tea.jpg']
         }
         
-        # Create Excel file with multiple sheets
-        with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-            pd.DataFrame(manufacturers_data).to_excel(writer, sheet_name='Manufacturers', index=False)
-            pd.DataFrame(categories_data).to_excel(writer, sheet_name='Categories', index=False)
-            pd.DataFrame(products_data).to_excel(writer, sheet_name='Products', index=False)
+        # Create Excel file with multiple sheets, a header row followed by one row per record
+        sheets = (('Manufacturers', manufacturers_data),
+                  ('Categories', categories_data),
+                  ('Products', products_data))
+        if xlsxwriter is not None:
+            workbook = xlsxwriter.Workbook(filename, {'constant_memory': True})
+            for sheet_name, data in sheets:
+                sheet = workbook.add_worksheet(sheet_name)
+                sheet.write_row(0, 0, list(data))
+                for row_number, row in enumerate(zip(*data.values()), start=1):
+                    sheet.write_row(row_number, 0, row)
+            workbook.close()
+        else:
+            workbook = Workbook(write_only=True)
+            for sheet_name, data in sheets:
+                sheet = workbook.create_sheet(sheet_name)
+                sheet.append(list(data))
+                for row in zip(*data.values()):
+                    sheet.append(row)
+            workbook.save(filename)
         
         print(f"Sample Excel template created: {filename}")
         print("\nTemplate structure:")
@@ -246,6 +496,7 @@ def main():
         print("Usage:")
         print("  python excel_import.py create_template    # Create sample Excel template")
         print("  python excel_import.py import <file.xlsx>  # Import from Excel file")
+        print("  python excel_import.py import <file.xlsx> --fast  # Import through SQLite's csv extension")
         return
     
     command = sys.argv[1]
@@ -258,14 +509,38 @@ def main():
             print(f"File not found: {excel_file}")
             return
         
+        # Check the products key before any sheet is imported, so a database
+        # that needs update_database_schema.py is not left half-imported
+        conn = _connect('khmer_products.db')
+        try:
+            _ensure_product_key(conn)
+        except (RuntimeError, sqlite3.Error) as e:
+            print(f"Cannot import into khmer_products.db: {e}")
+            return
+        finally:
+            conn.close()
+        
         print(f"Importing from {excel_file}...")
         
-        # Import in order: categories, manufacturers, then products
-        success1 = import_categories_from_excel(excel_file)
-        success2 = import_manufacturers_from_excel(excel_file)
-        success3 = import_products_from_excel(excel_file)
+        success = None
+        if '--fast' in sys.argv[3:]:
+            success = import_from_excel_fast(excel_file)
+            if success is None:
+                print("SQLite csv extension is not available; using the standard import")
+        
+        if success is None:
+            # Parse the workbook once and read every sheet from it.
+            # Products need the manufacturers, so they go last.
+            workbook = _open_workbook(excel_file)
+            try:
+                success1 = import_categories_from_excel(workbook)
+                success2 = import_manufacturers_from_excel(workbook)
+                success3 = import_products_from_excel(workbook)
+            finally:
+                workbook.close()
+            success = success1 and success2 and success3
         
-        if success1 and success2 and success3:
+        if success:
             print("\nImport completed successfully!")
         else:
             print("\nImport completed with some errors. Check the output above.")
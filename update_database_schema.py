@@ -7,6 +7,11 @@ Adds new business fields to the existing manufacturers table without losing data
 import sqlite3
 import os
 
+from create_database import (
+    configure_connection, create_category_triggers, create_materialized_tables, create_product_key,
+    create_rollup_tables, create_search_index
+)
+
 def update_manufacturers_table(db_path='khmer_products.db'):
     """
     Add new business fields to the manufacturers table.
@@ -16,12 +21,13 @@ def update_manufacturers_table(db_path='khmer_products.db'):
         return False
     
     try:
-        conn = sqlite3.connect(db_path)
+        conn = sqlite3.connect(db_path, timeout=30)
+        configure_connection(conn, db_path)
         cursor = conn.cursor()
         
         # Check if the new columns already exist
         cursor.execute("PRAGMA table_info(manufacturers)")
-        columns = [column[1] for column in cursor.fetchall()]
+        columns = {column[1] for column in cursor.fetchall()}
         
         new_columns = [
             'business_name',
@@ -30,16 +36,21 @@ def update_manufacturers_table(db_path='khmer_products.db'):
             'business_social_network',
             'banner_path'
         ]
+        missing = [column for column in new_columns if column not in columns]
         
-        # Add new columns if they don't exist
+        # Add all missing columns in one transaction
+        if missing:
+            cursor.executescript(
+                "BEGIN;"
+                + "".join(f"ALTER TABLE manufacturers ADD COLUMN {column} TEXT;" for column in missing)
+                + "COMMIT;"
+            )
         for column in new_columns:
-            if column not in columns:
-                cursor.execute(f'ALTER TABLE manufacturers ADD COLUMN {column} TEXT')
+            if column in missing:
                 print(f"Added column: {column}")
             else:
                 print(f"Column {column} already exists")
         
-        conn.commit()
         conn.close()
         
         print("Database schema updated successfully!")
@@ -50,5 +61,29 @@ def update_manufacturers_table(db_path='khmer_products.db'):
         print(f"Error updating database schema: {e}")
         return False
 
+def update_materialized_tables(db_path='khmer_products.db'):
+    """
+    Add the products unique key and create (or rebuild) the trigger-maintained
+    tables that database_examples.py reads from.
+    """
+    if not os.path.exists(db_path):
+        print(f"Database {db_path} does not exist!")
+        return False
+    
+    try:
+        conn = sqlite3.connect(db_path, isolation_level=None)
+        create_product_key(conn, conn.cursor())
+        create_materialized_tables(conn, conn.cursor())
+        create_search_index(conn, conn.cursor())
+        create_rollup_tables(conn, conn.cursor())
+        create_category_triggers(conn, conn.cursor())
+        conn.close()
+        return True
+        
+    except Exception as e:
+        print(f"Error updating materialized tables: {e}")
+        return False
+
 if __name__ == '__main__':
-    update_manufacturers_table()
\ No newline at end of file
+    update_manufacturers_table()
+    update_materialized_tables()
\ No newline at end of file